@@ -146,6 +146,11 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# voter_analytics: answer voter list filters and graphs from an in-memory
+# NumPy bitmap index (ignored if NumPy is not installed); with False they
+# are answered by SQL, the graphs from the VoterCube table
+VOTER_BITMAP_INDEX = True
+
 # declarations to ref static files
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 STATIC_URL = "static/"  # note: no leading slash!
@@ -1,3 +1,23 @@
+# marathon_analytics/admin.py
+
 from django.contrib import admin
 
 # Register your models here.
+from .models import SplitAnomaly
+
+
+@admin.register(SplitAnomaly)
+class SplitAnomalyAdmin(admin.ModelAdmin):
+    """Review page listing the flagged split anomalies, most extreme first."""
+
+    list_display = ["result", "race", "kind", "split_ratio", "score", "reviewed"]
+    list_editable = ["reviewed"]
+    list_filter = ["race", "kind", "reviewed"]
+    list_select_related = ["result", "race"]
+    search_fields = ["result__bib", "result__last_name", "result__first_name"]
+    raw_id_fields = ["result"]
+    actions = ["mark_reviewed"]
+
+    @admin.action(description="Mark selected anomalies as reviewed")
+    def mark_reviewed(self, request, queryset):
+        queryset.update(reviewed=True)
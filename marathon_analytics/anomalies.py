@@ -0,0 +1,148 @@
+# marathon_analytics/anomalies.py
+
+import numpy as np
+from django.db import transaction
+
+from .models import Result, SplitAnomaly
+
+# robust z-score beyond which a split ratio is flagged
+ROBUST_Z_THRESHOLD = 3.5
+
+# cohorts smaller than this are too small to judge and are not flagged
+MIN_COHORT_SIZE = 30
+
+# scales the median absolute deviation to a normal standard deviation
+MAD_SCALE = 1.4826
+
+
+def group_medians(groups, values, n_groups):
+    """
+    Return the median of values within each group (integer codes 0..n_groups-1,
+    every group non-empty), from one sort of all the values by group.
+    """
+    values = values[np.lexsort((values, groups))]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    return (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2
+
+
+def robust_z_scores(groups, values):
+    """
+    Return the robust z-score of every value within its group: its distance
+    from the group median in units of the group's scaled median absolute
+    deviation (0 where the deviation is 0).
+    """
+    groups = np.unique(groups, return_inverse=True)[1].ravel()
+    n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+    medians = group_medians(groups, values, n_groups)
+    deviations = np.abs(values - medians[groups])
+    mads = group_medians(groups, deviations, n_groups) * MAD_SCALE
+
+    scale = mads[groups]
+    z = np.zeros(len(values))
+    np.divide(values - medians[groups], scale, out=z, where=scale > 0)
+    return z
+
+
+def find_split_anomalies(cohorts, half1, half2):
+    """
+    Return (positions, ratios, z): the runners whose log(half2 / half1) has
+    a robust z-score beyond ROBUST_Z_THRESHOLD within their cohort (any
+    integer key per runner, e.g. race/gender/division), with their split
+    ratios and signed z-scores. Runners of cohorts smaller than
+    MIN_COHORT_SIZE, or without positive splits, are never flagged.
+    """
+    valid = (half1 > 0) & (half2 > 0)
+    ratios = np.ones(len(half1))
+    np.divide(half2, half1, out=ratios, where=valid)
+
+    z = robust_z_scores(cohorts, np.log(ratios))
+
+    sizes = np.unique(cohorts, return_inverse=True, return_counts=True)
+    large = sizes[2][sizes[1].ravel()] >= MIN_COHORT_SIZE
+
+    positions = np.flatnonzero(valid & large & (np.abs(z) > ROBUST_Z_THRESHOLD))
+    return positions, ratios[positions], z[positions]
+
+
+def reviewed_marks(race=None):
+    """
+    Return the (race id, bib, kind) of every reviewed SplitAnomaly of race
+    (of every race if race is None). Keyed on the bib rather than the Result,
+    so the marks survive a reload that replaces the race's Results.
+    """
+    anomalies = SplitAnomaly.objects.filter(reviewed=True)
+    if race is not None:
+        anomalies = anomalies.filter(race=race)
+    return set(anomalies.values_list("race_id", "result__bib", "kind"))
+
+
+def update_split_anomalies(race=None, reviewed=None):
+    """
+    Flag the Results of race (of every race if race is None) with
+    implausible half splits, replacing the previous flags. The whole table is
+    scored in one vectorized pass, each runner against their own race,
+    gender and division. Flags that are raised again keep their reviewed
+    mark: reviewed is the reviewed_marks() to keep, by default those of the
+    flags being replaced. Returns the number of anomalies stored.
+    """
+    results = Result.objects.all()
+    anomalies = SplitAnomaly.objects.all()
+    if race is not None:
+        results = results.filter(race=race)
+        anomalies = anomalies.filter(race=race)
+    if reviewed is None:
+        reviewed = reviewed_marks(race)
+
+    rows = list(
+        results.values_list(
+            "id",
+            "race_id",
+            "bib",
+            "gender",
+            "division",
+            "half1_seconds",
+            "half2_seconds",
+        )
+    )
+    if not rows:
+        anomalies.delete()
+        return 0
+
+    ids, race_ids, bibs, genders, divisions, half1, half2 = zip(*rows)
+    gender_codes = np.unique(np.array(genders, dtype=str), return_inverse=True)[1]
+    division_codes = np.unique(np.array(divisions, dtype=str), return_inverse=True)[1]
+    cohorts = (
+        np.array(race_ids, dtype=np.int64) * (gender_codes.max() + 1) + gender_codes
+    ) * (division_codes.max() + 1) + division_codes
+
+    positions, ratios, z = find_split_anomalies(
+        cohorts,
+        np.array(half1, dtype=np.float64),
+        np.array(half2, dtype=np.float64),
+    )
+
+    flags = []
+    for i, ratio, score in zip(positions.tolist(), ratios.tolist(), z.tolist()):
+        kind = (
+            SplitAnomaly.FAST_SECOND_HALF
+            if score < 0
+            else SplitAnomaly.SLOW_SECOND_HALF
+        )
+        flags.append(
+            SplitAnomaly(
+                race_id=race_ids[i],
+                result_id=ids[i],
+                kind=kind,
+                split_ratio=ratio,
+                score=abs(score),
+                reviewed=(race_ids[i], bibs[i], kind) in reviewed,
+            )
+        )
+
+    with transaction.atomic():
+        anomalies.delete()
+        SplitAnomaly.objects.bulk_create(flags, batch_size=2000)
+
+    return len(flags)
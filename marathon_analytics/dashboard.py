@@ -0,0 +1,177 @@
+# marathon_analytics/dashboard.py
+
+import json
+
+import numpy as np
+import plotly.graph_objs as go
+import plotly.io as pio
+
+from .models import Race, RaceDashboard, Result, format_seconds
+
+# width of the finish-time histogram bins, in seconds
+FINISH_BIN_SECONDS = 5 * 60
+
+# width of the half-split density cells, in seconds
+SPLIT_BIN_SECONDS = 5 * 60
+
+# width of the start throughput bins, in seconds
+START_BIN_SECONDS = 60
+
+
+def _clock(seconds):
+    """Format a number of seconds since midnight as HH:MM."""
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}"
+
+
+def _binned(values, width):
+    """
+    Return (starts, counts) for values counted in bins of width, from the
+    bin of the smallest value to that of the largest.
+    """
+    bins = values // width
+    first = int(bins.min())
+    counts = np.bincount(bins - first)
+    starts = (np.arange(len(counts)) + first) * width
+    return starts.tolist(), counts.tolist()
+
+
+def _figure(data, title, **layout):
+    """
+    Return a figure as a plain dict of JSON data. The default template,
+    several kilobytes repeated in every figure, is left out; with_template
+    puts it back when the figure is drawn.
+    """
+    fig = go.Figure(data=data, layout=dict(title_text=title, **layout))
+    figure = json.loads(fig.to_json())
+    figure["layout"].pop("template", None)
+    return figure
+
+
+def with_template(figure):
+    """Return a stored figure with plotly's default template applied."""
+    template = pio.templates[pio.templates.default].to_plotly_json()
+    return {**figure, "layout": {**figure.get("layout", {}), "template": template}}
+
+
+def finish_histogram(finish):
+    """Return the figure counting finishers per FINISH_BIN_SECONDS of time."""
+    starts, counts = _binned(finish, FINISH_BIN_SECONDS)
+    x = [format_seconds(t) for t in starts]
+    return _figure(
+        [go.Bar(x=x, y=counts)],
+        "Finish Times",
+        xaxis_title="finish time",
+        yaxis_title="runners",
+    )
+
+
+def split_density(half1, half2):
+    """Return the figure counting runners per cell of (first, second) half."""
+    x_starts, _ = _binned(half1, SPLIT_BIN_SECONDS)
+    y_starts, _ = _binned(half2, SPLIT_BIN_SECONDS)
+    counts, _, _ = np.histogram2d(
+        half2,
+        half1,
+        bins=[len(y_starts), len(x_starts)],
+        range=[
+            [y_starts[0], y_starts[-1] + SPLIT_BIN_SECONDS],
+            [x_starts[0], x_starts[-1] + SPLIT_BIN_SECONDS],
+        ],
+    )
+    return _figure(
+        [
+            go.Heatmap(
+                x=[format_seconds(t) for t in x_starts],
+                y=[format_seconds(t) for t in y_starts],
+                z=counts.astype(int).tolist(),
+                colorscale="Viridis",
+            )
+        ],
+        "Half Splits",
+        xaxis_title="first half",
+        yaxis_title="second half",
+    )
+
+
+def field_breakdown(genders, divisions):
+    """Return the sunburst figure of runners by gender and division."""
+    ids, labels, parents, values = [], [], [], []
+    for gender in np.unique(genders):
+        in_gender = genders == gender
+        ids.append(gender)
+        labels.append(gender)
+        parents.append("")
+        values.append(int(np.count_nonzero(in_gender)))
+        names, counts = np.unique(divisions[in_gender], return_counts=True)
+        for division, count in zip(names, counts):
+            ids.append(f"{gender}/{division}")
+            labels.append(division)
+            parents.append(gender)
+            values.append(int(count))
+    return _figure(
+        [
+            go.Sunburst(
+                ids=ids,
+                labels=labels,
+                parents=parents,
+                values=values,
+                branchvalues="total",
+            )
+        ],
+        "Runners by Gender and Division",
+    )
+
+
+def start_throughput(start):
+    """Return the figure counting runners starting per START_BIN_SECONDS."""
+    starts, counts = _binned(start, START_BIN_SECONDS)
+    return _figure(
+        [go.Bar(x=[_clock(t) for t in starts], y=counts)],
+        "Runners Starting per Minute",
+        xaxis_title="time of day",
+        yaxis_title="runners",
+    )
+
+
+def build_figures(race):
+    """Return {name: figure} for race's dashboard, or {} if it has no results."""
+    rows = list(
+        Result.objects.filter(race=race).values_list(
+            "gender",
+            "division",
+            "finish_seconds",
+            "half1_seconds",
+            "half2_seconds",
+            "start_seconds",
+        )
+    )
+    if not rows:
+        return {}
+
+    gender, division, finish, half1, half2, start = zip(*rows)
+    gender = np.array(gender, dtype=str)
+    division = np.array(division, dtype=str)
+    finish, half1, half2, start = (
+        np.array(values, dtype=np.int64) for values in (finish, half1, half2, start)
+    )
+
+    return {
+        "finish_histogram": finish_histogram(finish),
+        "split_density": split_density(half1, half2),
+        "field_breakdown": field_breakdown(gender, division),
+        "start_throughput": start_throughput(start),
+    }
+
+
+def refresh_dashboard(race=None):
+    """
+    Recompute and store the dashboard figures of race (of every race if race
+    is None). Returns the number of dashboards stored.
+    """
+    if race is None:
+        return sum(refresh_dashboard(race) for race in Race.objects.all())
+
+    RaceDashboard.objects.update_or_create(
+        race=race, defaults={"figures": build_figures(race)}
+    )
+    return 1
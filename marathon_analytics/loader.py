@@ -0,0 +1,383 @@
+# marathon_analytics/loader.py
+
+import csv
+import gzip
+import hashlib
+import io
+import time
+from collections import Counter
+from datetime import time as time_of_day
+
+from django.db import connection, transaction
+
+from .anomalies import reviewed_marks, update_split_anomalies
+from .dashboard import refresh_dashboard
+from .models import Result, SplitAnomaly, bump_data_version
+from .passing import update_passing_counts
+from .snapshot import invalidate_snapshot
+from .summaries import refresh_division_summaries
+
+# number of Result rows sent to the database per executemany()
+BATCH_SIZE = 2000
+
+# columns in the results CSV, in file order
+NUM_FIELDS = 16
+
+# Result fields written by a full load, in INSERT column order
+INSERT_FIELDS = [
+    field for field in Result._meta.concrete_fields if not field.primary_key
+]
+
+# Result columns overwritten when an incremental load updates a row; the
+# passing counts are recomputed for the whole race afterwards
+UPSERT_FIELDS = [
+    field.name
+    for field in Result._meta.concrete_fields
+    if field.name not in ("id", "race", "bib", "runners_passed", "runners_passed_by")
+]
+
+
+class LoadStats:
+    """Summary of one CSV load: rows created, rows skipped and why, timing."""
+
+    def __init__(self):
+        self.loaded = 0
+        self.skipped = 0
+        self.skip_reasons = Counter()
+        self.first_skipped_lines = []
+        self.elapsed = 0.0
+
+    def skip(self, line_num, reason):
+        """Record that the row on line_num was skipped for reason."""
+        self.skipped += 1
+        self.skip_reasons[reason] += 1
+        if len(self.first_skipped_lines) < 10:
+            self.first_skipped_lines.append(line_num)
+
+    @property
+    def rows_per_second(self):
+        """Return the number of rows read per second of wall-clock time."""
+        if self.elapsed <= 0:
+            return 0.0
+        return (self.loaded + self.skipped) / self.elapsed
+
+    def __str__(self):
+        return (
+            f"Loaded {self.loaded} results, skipped {self.skipped} "
+            f"in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/sec)."
+        )
+
+
+class SyncStats(LoadStats):
+    """Summary of one incremental load: LoadStats split by what was done."""
+
+    def __init__(self):
+        super().__init__()
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = 0
+
+    def __str__(self):
+        return (
+            f"Created {self.created}, updated {self.updated}, deleted "
+            f"{self.deleted} and left {self.unchanged} results unchanged, "
+            f"skipped {self.skipped} in {self.elapsed:.2f}s "
+            f"({self.rows_per_second:.0f} rows/sec)."
+        )
+
+
+def open_csv(filename):
+    """Open filename for text reading, transparently un-gzipping it if needed."""
+    f = open(filename, "rb")
+    magic = f.read(2)
+    f.seek(0)
+    if magic == b"\x1f\x8b":
+        f = gzip.GzipFile(fileobj=f)
+    return io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+
+
+def parse_time(value):
+    """Parse an H:MM:SS string from the results file into a datetime.time."""
+    parts = value.strip().split(":")
+    if len(parts) != 3:
+        raise ValueError(f"invalid time {value!r}")
+    hour, minute, second = (int(p) for p in parts)
+    return time_of_day(hour, minute, second)
+
+
+def row_hash(fields):
+    """Return a hash of one row of CSV fields, used to spot changed rows."""
+    return hashlib.md5("\x1f".join(fields).encode()).hexdigest()
+
+
+def build_result(fields, race):
+    """Create (but do not save) a Result in race from one row of CSV fields."""
+    if len(fields) != NUM_FIELDS:
+        raise ValueError(f"expected {NUM_FIELDS} fields, got {len(fields)}")
+
+    result = Result(
+        race=race,
+        bib=int(fields[0]),
+        first_name=fields[1],
+        last_name=fields[2],
+        ctz=fields[3],
+        city=fields[4],
+        state=fields[5],
+        gender=fields[6],
+        division=fields[7],
+        place_overall=int(fields[8]),
+        place_gender=int(fields[9]),
+        place_division=int(fields[10]),
+        start_time_of_day=parse_time(fields[11]),
+        finish_time_of_day=parse_time(fields[12]),
+        time_finish=parse_time(fields[13]),
+        time_half1=parse_time(fields[14]),
+        time_half2=parse_time(fields[15]),
+    )
+    result.set_seconds()
+    result.set_search_keys()
+    result.row_hash = row_hash(fields)
+    return result
+
+
+def _skip_reason(error):
+    """Collapse an exception into a short reason used to group skipped rows."""
+    message = str(error)
+    if message.startswith("expected"):
+        return "wrong number of fields"
+    if message.startswith("invalid time") or "must be in" in message:
+        return "invalid time"
+    if "invalid literal for int()" in message:
+        return "invalid number"
+    if message.startswith("duplicate bib"):
+        return "duplicate bib"
+    return type(error).__name__
+
+
+def insert_results(results):
+    """
+    INSERT unsaved Results with a single executemany(). bulk_create() is held
+    to SQLite's 999 query parameters, about 30 results per statement, so a
+    large file would compile over a thousand INSERT statements.
+    """
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        connection.ops.quote_name(Result._meta.db_table),
+        ", ".join(connection.ops.quote_name(field.column) for field in INSERT_FIELDS),
+        ", ".join(["%s"] * len(INSERT_FIELDS)),
+    )
+    # the times need adapting to the database; every other value is stored
+    # as it is (calling get_db_prep_save() per value is far slower)
+    adapt_time = connection.ops.adapt_timefield_value
+    columns = [
+        (field.attname, field.get_internal_type() == "TimeField")
+        for field in INSERT_FIELDS
+    ]
+    rows = [
+        [
+            (
+                adapt_time(getattr(result, attname))
+                if is_time
+                else getattr(result, attname)
+            )
+            for attname, is_time in columns
+        ]
+        for result in results
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def delete_results(race):
+    """
+    Delete the Results of race and their split anomalies. Deleting the
+    anomalies first, then the results in one DELETE, spares the ORM's
+    cascade from fetching every Result.
+    """
+    SplitAnomaly.objects.filter(race=race).delete()
+    table = connection.ops.quote_name(Result._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE race_id = %s", [race.pk])
+
+
+def analyze_results():
+    """
+    Refresh the database's statistics for the Result table, so the query
+    planner picks the narrow search/bib indexes over walking the race's
+    place index.
+    """
+    if connection.vendor in ("sqlite", "postgresql"):
+        table = connection.ops.quote_name(Result._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {table}")
+
+
+def read_rows(f, stats):
+    """
+    Yield (line_num, bib, fields) for each data row of the open CSV file f.
+    Rows without a valid bib, or repeating a bib already seen, are recorded
+    as skipped in stats.
+    """
+    reader = csv.reader(f)
+    next(reader, None)  # discard headers
+
+    seen = set()
+    for line_num, fields in enumerate(reader, start=2):
+        if not fields:
+            continue
+
+        try:
+            if len(fields) != NUM_FIELDS:
+                raise ValueError(f"expected {NUM_FIELDS} fields, got {len(fields)}")
+            bib = int(fields[0])
+            if bib in seen:
+                raise ValueError(f"duplicate bib {bib}")
+        except ValueError as e:
+            stats.skip(line_num, _skip_reason(e))
+            continue
+
+        seen.add(bib)
+        yield line_num, bib, fields
+
+
+def load_results(filename, race, batch_size=BATCH_SIZE):
+    """
+    Replace the Result records of race with the rows of the CSV file at
+    filename. Other races' results are left untouched.
+
+    Rows are streamed through the csv module and inserted by
+    insert_results() in batches of batch_size, all inside one transaction:
+    either the whole file is loaded or the table is left untouched. The
+    precomputed passing counts, division summaries, dashboard and split
+    anomalies are refreshed and the data version bumped before the
+    transaction commits, and the table's planner statistics after. Split
+    anomalies that had been reviewed keep their mark if the reloaded runner
+    is flagged again. Returns a LoadStats.
+    """
+    stats = LoadStats()
+    started = time.perf_counter()
+
+    with open_csv(filename) as f, transaction.atomic():
+        # delete this race's existing records to prevent duplicates, taking
+        # note of the reviewed anomalies that go with them:
+        reviewed = reviewed_marks(race)
+        delete_results(race)
+
+        batch = []
+        for line_num, _, fields in read_rows(f, stats):
+            try:
+                batch.append(build_result(fields, race))
+            except (ValueError, TypeError) as e:
+                stats.skip(line_num, _skip_reason(e))
+                continue
+
+            if len(batch) >= batch_size:
+                insert_results(batch)
+                stats.loaded += len(batch)
+                batch = []
+
+        if batch:
+            insert_results(batch)
+            stats.loaded += len(batch)
+
+        update_passing_counts(race)
+        refresh_division_summaries(race)
+        refresh_dashboard(race)
+        update_split_anomalies(race, reviewed)
+        bump_data_version()
+
+    analyze_results()
+    invalidate_snapshot()
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def sync_results(filename, race, batch_size=BATCH_SIZE):
+    """
+    Bring the Result records of race in line with the CSV file at filename,
+    writing only what changed: rows whose bib is new are inserted, rows
+    whose hash differs from the stored row_hash are updated in place
+    (keeping their id), and stored bibs missing from the file are deleted.
+
+    The file is read and hashed before the transaction starts, and only the
+    new or changed rows are parsed. The transaction holds just the writes:
+    the upsert, the deletes and, only if a runner came, went or changed
+    their start or finish time of day, the passing counts. The division
+    summaries, dashboard and split anomalies are rebuilt after it commits,
+    and only if something changed.
+    Returns a SyncStats.
+    """
+    stats = SyncStats()
+    started = time.perf_counter()
+
+    with open_csv(filename) as f:
+        incoming = {
+            bib: (line_num, fields, row_hash(fields))
+            for line_num, bib, fields in read_rows(f, stats)
+        }
+
+    with transaction.atomic():
+        results = Result.objects.filter(race=race)
+        stored = dict(results.values_list("bib", "row_hash"))
+
+        changed = []
+        for bib, (line_num, fields, digest) in incoming.items():
+            old_digest = stored.get(bib)
+            if digest == old_digest:
+                stats.unchanged += 1
+                continue
+            try:
+                result = build_result(fields, race)
+            except (ValueError, TypeError) as e:
+                stats.skip(line_num, _skip_reason(e))
+                continue
+            changed.append(result)
+            if old_digest is None:
+                stats.created += 1
+            else:
+                stats.updated += 1
+
+        # the times of day of the updated runners, before the update
+        updated = [r.bib for r in changed if r.bib in stored]
+        old_times = {}
+        for i in range(0, len(updated), batch_size):
+            old_times.update(
+                (bib, times)
+                for bib, *times in results.filter(
+                    bib__in=updated[i : i + batch_size]
+                ).values_list("bib", "start_seconds", "finish_tod_seconds")
+            )
+        times_changed = stats.created > 0 or any(
+            old_times[r.bib] != [r.start_seconds, r.finish_tod_seconds]
+            for r in changed
+            if r.bib in old_times
+        )
+
+        removed = [bib for bib in stored if bib not in incoming]
+        for i in range(0, len(removed), batch_size):
+            _, deleted = results.filter(bib__in=removed[i : i + batch_size]).delete()
+            stats.deleted += deleted.get(Result._meta.label, 0)
+
+        Result.objects.bulk_create(
+            changed,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=["race", "bib"],
+            update_fields=UPSERT_FIELDS,
+        )
+
+        if times_changed or removed:
+            update_passing_counts(race)
+        if changed or removed:
+            bump_data_version()
+
+    if changed or removed:
+        invalidate_snapshot()
+        refresh_division_summaries(race)
+        refresh_dashboard(race)
+        update_split_anomalies(race)
+
+    stats.loaded = stats.created + stats.updated + stats.unchanged
+    stats.elapsed = time.perf_counter() - started
+    return stats
@@ -0,0 +1,23 @@
+# marathon_analytics/management/commands/compute_passing.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marathon_analytics.passing import update_passing_counts
+
+
+class Command(BaseCommand):
+    """Recompute the stored runners passed / passed by counts."""
+
+    help = "Recompute runners_passed and runners_passed_by for every Result."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = update_passing_counts()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated passing counts for {count} results in {elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,26 @@
+# marathon_analytics/management/commands/compute_summaries.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marathon_analytics.dashboard import refresh_dashboard
+from marathon_analytics.summaries import refresh_division_summaries
+
+
+class Command(BaseCommand):
+    """Recompute the stored per-division leaderboards and race dashboards."""
+
+    help = "Recompute the DivisionSummary rows and dashboard of every race."
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = refresh_division_summaries()
+        dashboards = refresh_dashboard()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Updated {count} division summaries and {dashboards} dashboards "
+                f"in {elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,24 @@
+# marathon_analytics/management/commands/detect_split_anomalies.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from marathon_analytics.anomalies import update_split_anomalies
+
+
+class Command(BaseCommand):
+    """Flag the Results with implausible half splits for review."""
+
+    help = (
+        "Score every Result's half splits against its race/gender/division "
+        "cohort and store the outliers as SplitAnomaly flags."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = update_split_anomalies()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(f"Flagged {count} split anomalies in {elapsed:.2f}s.")
+        )
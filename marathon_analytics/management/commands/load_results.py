@@ -0,0 +1,66 @@
+# marathon_analytics/management/commands/load_results.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from marathon_analytics.loader import BATCH_SIZE, load_results, sync_results
+from marathon_analytics.models import DEFAULT_RACE, RESULTS_FILENAME, Race
+
+
+class Command(BaseCommand):
+    """Load one race's marathon results from a (optionally gzipped) CSV file."""
+
+    help = (
+        "Replace one race's marathon Results with the rows of a CSV or CSV.gz "
+        "file, leaving other races untouched. With --incremental, only the "
+        "rows that changed since the last load are written."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("filename", nargs="?", default=RESULTS_FILENAME)
+        parser.add_argument(
+            "--race",
+            default=DEFAULT_RACE["slug"],
+            help=f"slug of the race to load (default {DEFAULT_RACE['slug']})",
+        )
+        parser.add_argument("--name", help="race name, when creating a new race")
+        parser.add_argument("--year", type=int, help="year, when creating a new race")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="only insert, update and delete the rows that changed, by bib",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"rows per bulk INSERT (default {BATCH_SIZE})",
+        )
+
+    def get_race(self, options):
+        """Return the Race to load into, creating it if needed."""
+        race = Race.objects.filter(slug=options["race"]).first()
+        if race is not None:
+            return race
+
+        name, year = options["name"], options["year"]
+        if options["race"] == DEFAULT_RACE["slug"]:
+            name = name or DEFAULT_RACE["name"]
+            year = year or DEFAULT_RACE["year"]
+        if not name or not year:
+            raise CommandError(
+                f"Race {options['race']!r} does not exist; give --name and --year "
+                f"to create it."
+            )
+        return Race.objects.create(slug=options["race"], name=name, year=year)
+
+    def handle(self, *args, **options):
+        race = self.get_race(options)
+        load = sync_results if options["incremental"] else load_results
+        stats = load(options["filename"], race, batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"{race}: {stats}"))
+        for reason, count in stats.skip_reasons.most_common():
+            self.stdout.write(f"  skipped {count} rows: {reason}")
+        if stats.first_skipped_lines:
+            lines = ", ".join(str(n) for n in stats.first_skipped_lines)
+            self.stdout.write(f"  first skipped lines: {lines}")
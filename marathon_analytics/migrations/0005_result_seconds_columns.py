@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0004_result_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="result",
+            name="finish_seconds",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="finish_tod_seconds",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="half1_seconds",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="half2_seconds",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="start_seconds",
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+    ]
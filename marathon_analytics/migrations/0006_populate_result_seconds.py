@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def _seconds(t):
+    return (t.hour * 60 + t.minute) * 60 + t.second
+
+
+def populate_seconds(apps, schema_editor):
+    """Fill the integer-seconds columns of existing Results from their times."""
+    Result = apps.get_model("marathon_analytics", "Result")
+    rows = Result.objects.values_list(
+        "id",
+        "time_finish",
+        "time_half1",
+        "time_half2",
+        "start_time_of_day",
+        "finish_time_of_day",
+    )
+    params = [[_seconds(t) for t in row[1:]] + [row[0]] for row in rows.iterator()]
+
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(Result._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET finish_seconds = %s, half1_seconds = %s, "
+            f"half2_seconds = %s, start_seconds = %s, finish_tod_seconds = %s "
+            f"WHERE id = %s",
+            params,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0005_result_seconds_columns"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_seconds, migrations.RunPython.noop),
+    ]
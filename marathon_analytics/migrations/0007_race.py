@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0006_populate_result_seconds"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Race",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.TextField()),
+                ("year", models.IntegerField()),
+                ("slug", models.SlugField(unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="race",
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="results",
+                to="marathon_analytics.race",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def assign_default_race(apps, schema_editor):
+    """Put the existing (single-race) Results into the Chicago Marathon 2023."""
+    Race = apps.get_model("marathon_analytics", "Race")
+    Result = apps.get_model("marathon_analytics", "Result")
+
+    if not Result.objects.filter(race__isnull=True).exists():
+        return
+
+    race, _ = Race.objects.get_or_create(
+        slug="chicago-2023", defaults={"name": "Chicago Marathon", "year": 2023}
+    )
+    Result.objects.filter(race__isnull=True).update(race=race)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0007_race"),
+    ]
+
+    operations = [
+        migrations.RunPython(assign_default_race, migrations.RunPython.noop),
+    ]
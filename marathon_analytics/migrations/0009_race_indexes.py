@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0008_assign_results_to_race"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="result",
+            name="marathon_an_place_o_71c98e_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="result",
+            name="marathon_an_city_35f82e_idx",
+        ),
+        migrations.AlterField(
+            model_name="result",
+            name="race",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="results",
+                to="marathon_analytics.race",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "place_overall", "id"],
+                name="marathon_an_race_id_ed5f8a_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "city", "place_overall", "id"],
+                name="marathon_an_race_id_622465_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "bib"], name="marathon_an_race_id_66733b_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "finish_seconds"], name="marathon_an_race_id_d225a2_idx"
+            ),
+        ),
+    ]
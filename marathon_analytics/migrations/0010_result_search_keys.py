@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0009_race_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="result",
+            name="city_key",
+            field=models.TextField(default=""),
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="first_name_key",
+            field=models.TextField(default=""),
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="last_name_key",
+            field=models.TextField(default=""),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "last_name_key"], name="marathon_an_race_id_098348_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "first_name_key"], name="marathon_an_race_id_ea04c8_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="result",
+            index=models.Index(
+                fields=["race", "city_key"], name="marathon_an_race_id_c47bf7_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+def populate_search_keys(apps, schema_editor):
+    """Fill the lower-cased search columns of existing Results."""
+    Result = apps.get_model("marathon_analytics", "Result")
+    rows = Result.objects.values_list("id", "first_name", "last_name", "city")
+    params = [
+        (first.lower(), last.lower(), city.lower(), pk)
+        for pk, first, last, city in rows.iterator()
+    ]
+
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(Result._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET first_name_key = %s, last_name_key = %s, "
+            f"city_key = %s WHERE id = %s",
+            params,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0010_result_search_keys"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_search_keys, migrations.RunPython.noop),
+    ]
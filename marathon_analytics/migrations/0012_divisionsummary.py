@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0011_populate_result_search_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DivisionSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("gender", models.CharField(max_length=6)),
+                ("division", models.CharField(max_length=6)),
+                ("runners", models.IntegerField()),
+                ("min_finish_seconds", models.IntegerField()),
+                ("median_finish_seconds", models.IntegerField()),
+                ("p90_finish_seconds", models.IntegerField()),
+                ("mean_half1_seconds", models.FloatField()),
+                ("mean_half2_seconds", models.FloatField()),
+                ("negative_split_ratio", models.FloatField()),
+                ("leaders", models.JSONField(default=list)),
+                (
+                    "race",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="division_summaries",
+                        to="marathon_analytics.race",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["gender", "division"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("race", "gender", "division"),
+                        name="unique_division_summary",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:49
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_bibs(apps, schema_editor):
+    """
+    Delete all but the first-loaded Result of each race and bib: loaders
+    before this migration kept repeated bibs, which the unique constraint
+    below would reject. Loading the race again refreshes its derived data.
+    """
+    Result = apps.get_model("marathon_analytics", "Result")
+    duplicates = (
+        Result.objects.values("race_id", "bib")
+        .annotate(n=Count("id"), first_id=Min("id"))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        Result.objects.filter(race_id=row["race_id"], bib=row["bib"]).exclude(
+            id=row["first_id"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0012_divisionsummary"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="result",
+            name="marathon_an_race_id_66733b_idx",
+        ),
+        migrations.AddField(
+            model_name="result",
+            name="row_hash",
+            field=models.CharField(default="", max_length=32),
+        ),
+        migrations.RunPython(remove_duplicate_bibs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="result",
+            constraint=models.UniqueConstraint(
+                fields=("race", "bib"), name="unique_race_bib"
+            ),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("marathon_analytics", "0014_racedashboard"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SplitAnomaly",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            (
+                                "fast_second_half",
+                                "Second half far faster than the first",
+                            ),
+                            (
+                                "slow_second_half",
+                                "Second half far slower than the first",
+                            ),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("split_ratio", models.FloatField()),
+                ("score", models.FloatField()),
+                ("reviewed", models.BooleanField(default=False)),
+                (
+                    "race",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="anomalies",
+                        to="marathon_analytics.race",
+                    ),
+                ),
+                (
+                    "result",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="anomalies",
+                        to="marathon_analytics.result",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "split anomalies",
+                "ordering": ["-score"],
+                "indexes": [
+                    models.Index(
+                        fields=["race", "kind", "score"],
+                        name="marathon_an_race_id_cdeba7_idx",
+                    )
+                ],
+            },
+        ),
+    ]
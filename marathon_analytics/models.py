@@ -1,14 +1,45 @@
 from django.db import models
 
 
+def time_to_seconds(t):
+    """Convert a datetime.time to the number of seconds since midnight."""
+    return (t.hour * 60 + t.minute) * 60 + t.second
+
+
+def format_seconds(seconds):
+    """Format a number of seconds as an H:MM:SS string (-H:MM:SS if negative)."""
+    seconds = int(round(seconds))
+    sign, seconds = ("-", -seconds) if seconds < 0 else ("", seconds)
+    return f"{sign}{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
 # Create your models here.
+class Race(models.Model):
+    """One edition of a marathon, e.g. the Chicago Marathon 2023."""
+
+    name = models.TextField()
+    year = models.IntegerField()
+    slug = models.SlugField(unique=True)
+
+    def __str__(self):
+        """Return a string representation of this model instance."""
+        return f"{self.name} {self.year}"
+
+    @classmethod
+    def get_default(cls):
+        """Return the most recent Race, or None if no race has been loaded."""
+        return cls.objects.order_by("-year", "-id").first()
+
+
 class Result(models.Model):
     """
-    Store/represent the data from one runner at the Chicago Marathon 2023.
+    Store/represent the data from one runner in one Race.
     BIB,First Name,Last Name,CTZ,City,State,Gender,Division,
     Place Overall,Place Gender,Place Division,Start TOD,Finish TOD,Finish,HALF1,HALF2
     """
 
+    race = models.ForeignKey(Race, on_delete=models.CASCADE, related_name="results")
+
     # identification
     bib = models.IntegerField()
     first_name = models.TextField()
@@ -34,70 +65,251 @@ class Result(models.Model):
     time_half1 = models.TimeField()
     time_half2 = models.TimeField()
 
+    # the same times as integer seconds (durations, or since midnight for the
+    # times of day), so they can be sorted, filtered and aggregated in SQL
+    finish_seconds = models.IntegerField(default=0, db_index=True)
+    half1_seconds = models.IntegerField(default=0, db_index=True)
+    half2_seconds = models.IntegerField(default=0, db_index=True)
+    start_seconds = models.IntegerField(default=0, db_index=True)
+    finish_tod_seconds = models.IntegerField(default=0, db_index=True)
+
+    # lower-cased copies of the searchable text, for indexed prefix search
+    first_name_key = models.TextField(default="")
+    last_name_key = models.TextField(default="")
+    city_key = models.TextField(default="")
+
+    # hash of the source CSV row, so a reload can skip unchanged rows
+    row_hash = models.CharField(max_length=32, default="")
+
+    # passing counts, precomputed for the whole field by passing.py
+    runners_passed = models.IntegerField(default=0)
+    runners_passed_by = models.IntegerField(default=0)
+
     def __str__(self):
         """Return a string representation of this model instance."""
         return f"{self.first_name} {self.last_name} ({self.city}, {self.state}), {self.time_finish}"
 
     def get_runners_passed(self):
         """Return the number of runners passed by this runner."""
-        started_first = Result.objects.filter(
-            start_time_of_day__lt=self.start_time_of_day
-        )
-        passed = started_first.filter(finish_time_of_day__gt=self.finish_time_of_day)
-
-        return len(passed)
+        return self.runners_passed
 
     def get_runners_passed_by(self):
         """Return the number of runners who passed this runner."""
-        started_later = Result.objects.filter(
-            start_time_of_day__gt=self.start_time_of_day
-        )
-        passed_by = started_later.filter(finish_time_of_day__lt=self.finish_time_of_day)
+        return self.runners_passed_by
+
+    def set_seconds(self):
+        """Fill in the integer-seconds columns from the TimeField columns."""
+        self.finish_seconds = time_to_seconds(self.time_finish)
+        self.half1_seconds = time_to_seconds(self.time_half1)
+        self.half2_seconds = time_to_seconds(self.time_half2)
+        self.start_seconds = time_to_seconds(self.start_time_of_day)
+        self.finish_tod_seconds = time_to_seconds(self.finish_time_of_day)
+
+    def set_search_keys(self):
+        """Fill in the lower-cased search columns from the name and city."""
+        self.first_name_key = self.first_name.lower()
+        self.last_name_key = self.last_name.lower()
+        self.city_key = self.city.lower()
+
+    class Meta:
+        indexes = [
+            # keyset pagination of one race's results, with and without a city
+            models.Index(fields=["race", "place_overall", "id"]),
+            models.Index(fields=["race", "city", "place_overall", "id"]),
+            models.Index(fields=["race", "finish_seconds"]),
+            # prefix search on name and city
+            models.Index(fields=["race", "last_name_key"]),
+            models.Index(fields=["race", "first_name_key"]),
+            models.Index(fields=["race", "city_key"]),
+        ]
+        constraints = [
+            # a bib identifies a runner within a race; incremental loads
+            # upsert on it
+            models.UniqueConstraint(fields=["race", "bib"], name="unique_race_bib"),
+        ]
+
+
+class DivisionSummary(models.Model):
+    """
+    Precomputed statistics and top finishers of one gender/division of a
+    Race, refreshed by summaries.py whenever the race's results are loaded.
+    Finish and split times are in seconds.
+    """
+
+    race = models.ForeignKey(
+        Race, on_delete=models.CASCADE, related_name="division_summaries"
+    )
+    gender = models.CharField(max_length=6)
+    division = models.CharField(max_length=6)
+
+    runners = models.IntegerField()
+    min_finish_seconds = models.IntegerField()
+    median_finish_seconds = models.IntegerField()
+    p90_finish_seconds = models.IntegerField()
+    mean_half1_seconds = models.FloatField()
+    mean_half2_seconds = models.FloatField()
+
+    # fraction of the division who ran the second half faster than the first
+    negative_split_ratio = models.FloatField()
+
+    # the fastest finishers, as a list of {"id", "bib", "name", "finish"}
+    leaders = models.JSONField(default=list)
+
+    def __str__(self):
+        """Return a string representation of this model instance."""
+        return f"{self.race} {self.gender} {self.division} ({self.runners} runners)"
+
+    def get_min_finish(self):
+        """Return the fastest finish time as H:MM:SS."""
+        return format_seconds(self.min_finish_seconds)
+
+    def get_median_finish(self):
+        """Return the median finish time as H:MM:SS."""
+        return format_seconds(self.median_finish_seconds)
+
+    def get_p90_finish(self):
+        """Return the finish time 90% of the division beat, as H:MM:SS."""
+        return format_seconds(self.p90_finish_seconds)
 
-        return len(passed_by)
+    def get_mean_half1(self):
+        """Return the mean first-half split as H:MM:SS."""
+        return format_seconds(self.mean_half1_seconds)
 
+    def get_mean_half2(self):
+        """Return the mean second-half split as H:MM:SS."""
+        return format_seconds(self.mean_half2_seconds)
 
-# revise load_data(): delete existing records before loading data.
+    def get_negative_split_percent(self):
+        """Return the percentage of the division with a negative split."""
+        return round(100 * self.negative_split_ratio, 1)
 
+    class Meta:
+        ordering = ["gender", "division"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["race", "gender", "division"],
+                name="unique_division_summary",
+            ),
+        ]
 
-def load_data():
-    """Function to load data records from CSV file into Django model instances."""
 
-    # delete existing records to prevent duplicates:
-    Result.objects.all().delete()
+class RaceDashboard(models.Model):
+    """
+    The charts of one Race's dashboard as Plotly figure JSON, rebuilt by
+    dashboard.py whenever the race's results are loaded.
+    """
+
+    race = models.OneToOneField(
+        Race, on_delete=models.CASCADE, related_name="dashboard"
+    )
+    figures = models.JSONField(default=dict)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """Return a string representation of this model instance."""
+        return f"Dashboard of {self.race} ({self.updated})"
+
+
+class SplitAnomaly(models.Model):
+    """
+    A Result whose half splits are implausible next to its gender/division
+    cohort, flagged by anomalies.py for review.
+    """
+
+    FAST_SECOND_HALF = "fast_second_half"
+    SLOW_SECOND_HALF = "slow_second_half"
+    KIND_CHOICES = [
+        (FAST_SECOND_HALF, "Second half far faster than the first"),
+        (SLOW_SECOND_HALF, "Second half far slower than the first"),
+    ]
+
+    race = models.ForeignKey(Race, on_delete=models.CASCADE, related_name="anomalies")
+    result = models.ForeignKey(
+        Result, on_delete=models.CASCADE, related_name="anomalies"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+
+    # second half / first half, and how many robust standard deviations its
+    # logarithm lies from the cohort median
+    split_ratio = models.FloatField()
+    score = models.FloatField()
+
+    reviewed = models.BooleanField(default=False)
+
+    def __str__(self):
+        """Return a string representation of this model instance."""
+        return f"{self.result}: {self.get_kind_display()} ({self.score:.1f})"
+
+    class Meta:
+        ordering = ["-score"]
+        indexes = [models.Index(fields=["race", "kind", "score"])]
+        verbose_name_plural = "split anomalies"
+
 
-    filename = "/Users/azs/Desktop/2023_chicago_results.csv"
-    f = open(filename)
-    f.readline()  # discard headers
+class DataVersion(models.Model):
+    """
+    A single-row counter bumped every time the Result table is reloaded, so
+    in-memory caches built from Results know when they are stale.
+    """
+
+    version = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """Return a string representation of this model instance."""
+        return f"Result data version {self.version} ({self.updated})"
+
+
+def get_data_version():
+    """Return the current version of the Result data (0 if never loaded)."""
+    version = DataVersion.objects.filter(pk=1).values_list("version", flat=True)
+    return version.first() or 0
 
-    for line in f:
-        fields = line.split(",")
 
-        try:
-            # create a new instance of Result object with this record from CSV
-            result = Result(
-                bib=fields[0],
-                first_name=fields[1],
-                last_name=fields[2],
-                ctz=fields[3],
-                city=fields[4],
-                state=fields[5],
-                gender=fields[6],
-                division=fields[7],
-                place_overall=fields[8],
-                place_gender=fields[9],
-                place_division=fields[10],
-                start_time_of_day=fields[11],
-                finish_time_of_day=fields[12],
-                time_finish=fields[13],
-                time_half1=fields[14],
-                time_half2=fields[15],
-            )
+def get_data_stamp():
+    """
+    Return a string identifying the current Result data across databases:
+    the version counter restarts at 1 in every new database, the time of
+    the last bump does not ("" if never loaded).
+    """
+    updated = DataVersion.objects.filter(pk=1).values_list("updated", flat=True)
+    updated = updated.first()
+    return updated.isoformat() if updated else ""
 
-            result.save()  # commit to database
-            print(f"Created result: {result}")
 
-        except:
-            print(f"Skipped: {fields}")
+def bump_data_version():
+    """Record that the Result data has changed; return the new version."""
+    data_version, _ = DataVersion.objects.get_or_create(pk=1)
+    data_version.version += 1
+    data_version.save()
+    return data_version.version
+
+
+# default location of the results file used by load_data()
+RESULTS_FILENAME = "/Users/azs/Desktop/2023_chicago_results.csv"
+
+# race that load_data() loads into when none is given
+DEFAULT_RACE = {"slug": "chicago-2023", "name": "Chicago Marathon", "year": 2023}
+
+
+def load_data(filename=RESULTS_FILENAME, race=None, incremental=False):
+    """
+    Function to load data records from CSV file into Django model instances,
+    replacing the results of that one race (the Chicago Marathon 2023 by
+    default). With incremental=True only new, changed and removed rows are
+    written.
+    """
+    from .loader import load_results, sync_results
+
+    if race is None:
+        race, _ = Race.objects.get_or_create(
+            slug=DEFAULT_RACE["slug"],
+            defaults={"name": DEFAULT_RACE["name"], "year": DEFAULT_RACE["year"]},
+        )
 
-    print(f"Done. Created {len(Result.objects.all())} Results.")
+    if incremental:
+        stats = sync_results(filename, race)
+    else:
+        stats = load_results(filename, race)
+    print(stats)
+    return stats
@@ -0,0 +1,85 @@
+# marathon_analytics/pagination.py
+
+from django.db.models import Q
+
+
+def _keyset_filter(keys, values, forward):
+    """
+    Return a Q selecting rows strictly after (forward) or before the
+    position given by values in the ordering on keys.
+    """
+    lookup = "gt" if forward else "lt"
+    condition = Q()
+    for i, key in enumerate(keys):
+        equal = {k: v for k, v in zip(keys[:i], values[:i])}
+        condition |= Q(**equal, **{f"{key}__{lookup}": values[i]})
+    return condition
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator, with cursors for its neighbours."""
+
+    def __init__(self, object_list, next_cursor, prev_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking on a unique ordering of integer keys
+    (e.g. place_overall, id) instead of using OFFSET, so every page costs the
+    same index range scan no matter how deep it is. A cursor is the key
+    values of a row joined with ".".
+    """
+
+    def __init__(self, queryset, keys, per_page):
+        self.queryset = queryset
+        self.keys = list(keys)
+        self.per_page = per_page
+
+    def encode(self, obj):
+        """Return the cursor for the position of obj."""
+        return ".".join(str(getattr(obj, key)) for key in self.keys)
+
+    def decode(self, cursor):
+        """Return the key values in cursor, or None if it is malformed."""
+        try:
+            values = [int(v) for v in cursor.split(".")]
+        except (AttributeError, ValueError):
+            return None
+        return values if len(values) == len(self.keys) else None
+
+    def page(self, after=None, before=None):
+        """
+        Return the KeysetPage following the cursor after, or preceding the
+        cursor before; with neither (or a malformed cursor) the first page.
+        """
+        after = self.decode(after) if after else None
+        before = self.decode(before) if before else None
+
+        if before is not None:
+            descending = [f"-{key}" for key in self.keys]
+            qs = self.queryset.filter(_keyset_filter(self.keys, before, False))
+            rows = list(qs.order_by(*descending)[: self.per_page + 1])
+            has_prev = len(rows) > self.per_page
+            rows = rows[: self.per_page][::-1]
+            has_next = True
+        else:
+            qs = self.queryset.order_by(*self.keys)
+            if after is not None:
+                qs = qs.filter(_keyset_filter(self.keys, after, True))
+            rows = list(qs[: self.per_page + 1])
+            has_next = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            has_prev = after is not None
+
+        next_cursor = self.encode(rows[-1]) if rows and has_next else None
+        prev_cursor = self.encode(rows[0]) if rows and has_prev else None
+        return KeysetPage(rows, next_cursor, prev_cursor)
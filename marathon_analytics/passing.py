@@ -0,0 +1,109 @@
+# marathon_analytics/passing.py
+
+from itertools import groupby
+
+from django.db import connection, transaction
+
+from .models import Race, Result
+
+
+class FenwickTree:
+    """Binary indexed tree of counts over the ranks 1..size."""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, rank):
+        """Count one more item at rank."""
+        self.total += 1
+        while rank <= self.size:
+            self.tree[rank] += 1
+            rank += rank & -rank
+
+    def count_upto(self, rank):
+        """Return the number of items with a rank <= rank."""
+        count = 0
+        while rank > 0:
+            count += self.tree[rank]
+            rank -= rank & -rank
+        return count
+
+
+def compute_passing_counts(starts, finishes):
+    """
+    Return (passed, passed_by) lists for runners with the given start and
+    finish times of day (any comparable values, one entry per runner).
+
+    A runner passed everyone who started strictly earlier and finished
+    strictly later, and was passed by everyone who started strictly later and
+    finished strictly earlier. Both counts are found by sweeping the runners
+    in start order while counting finish-time inversions with a Fenwick tree,
+    O(n log n) overall.
+    """
+    n = len(starts)
+    ranks = {f: rank for rank, f in enumerate(sorted(set(finishes)), start=1)}
+    finish_rank = [ranks[f] for f in finishes]
+    by_start = sorted(range(n), key=starts.__getitem__)
+
+    passed = [0] * n
+    tree = FenwickTree(len(ranks))
+    for _, group in groupby(by_start, key=starts.__getitem__):
+        group = list(group)
+        # only runners with a strictly earlier start are in the tree yet
+        for i in group:
+            passed[i] = tree.total - tree.count_upto(finish_rank[i])
+        for i in group:
+            tree.add(finish_rank[i])
+
+    passed_by = [0] * n
+    tree = FenwickTree(len(ranks))
+    for _, group in groupby(reversed(by_start), key=starts.__getitem__):
+        group = list(group)
+        for i in group:
+            passed_by[i] = tree.count_upto(finish_rank[i] - 1)
+        for i in group:
+            tree.add(finish_rank[i])
+
+    return passed, passed_by
+
+
+def update_passing_counts(race=None):
+    """
+    Recompute runners_passed and runners_passed_by for every Result of race
+    (of every race, each counted separately, if race is None) and store
+    those that changed. Returns the number of Results updated.
+    """
+    if race is None:
+        return sum(update_passing_counts(race) for race in Race.objects.all())
+
+    rows = list(
+        Result.objects.filter(race=race).values_list(
+            "id",
+            "start_seconds",
+            "finish_tod_seconds",
+            "runners_passed",
+            "runners_passed_by",
+        )
+    )
+    starts = [row[1] for row in rows]
+    finishes = [row[2] for row in rows]
+
+    passed, passed_by = compute_passing_counts(starts, finishes)
+
+    updates = [
+        (p, pb, row[0])
+        for row, p, pb in zip(rows, passed, passed_by)
+        if (p, pb) != row[3:]
+    ]
+
+    table = connection.ops.quote_name(Result._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET runners_passed = %s, runners_passed_by = %s "
+            f"WHERE id = %s",
+            updates,
+        )
+
+    return len(updates)
@@ -0,0 +1,185 @@
+# marathon_analytics/predictor.py
+
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from .models import get_data_stamp
+from .snapshot import get_snapshot
+
+# where the fitted predictor is saved between processes
+PREDICTOR_FILENAME = Path(__file__).resolve().parent / "data" / "predictor.json"
+
+# cohorts with fewer runners than this fall back to a broader cohort
+MIN_COHORT_SIZE = 30
+
+# bumped whenever the layout of the saved fits changes
+FILE_FORMAT = 4
+
+# residual percentiles used for the prediction interval
+INTERVAL_PERCENTILES = (5, 95)
+
+
+def fit_line(half1, finish):
+    """
+    Fit finish = intercept + slope * half1 by least squares and return the
+    fit as a dict, with the residual percentiles used for the interval and
+    the range of first halves it was fitted over.
+    """
+    A = np.column_stack([np.ones(len(half1)), half1])
+    (intercept, slope), *_ = np.linalg.lstsq(A, finish, rcond=None)
+    residuals = finish - (intercept + slope * half1)
+    low, high = np.percentile(residuals, INTERVAL_PERCENTILES)
+    return {
+        "intercept": float(intercept),
+        "slope": float(slope),
+        "low": float(low),
+        "high": float(high),
+        "n": int(len(half1)),
+        "half1_min": float(half1.min()),
+        "half1_max": float(half1.max()),
+    }
+
+
+def cohort_key(race_id, gender=None, division=None):
+    """Return the key a cohort's fit is stored under."""
+    return f"{race_id}|{gender or ''}|{division or ''}"
+
+
+class FinishTimePredictor:
+    """
+    Linear models predicting the finish time from the first-half split,
+    fitted for each race overall, per gender and per gender/division.
+    """
+
+    def __init__(self, version, fits, stamp=""):
+        self.version = version
+        self.fits = fits
+        self.stamp = stamp
+
+    @classmethod
+    def fit(cls, snapshot, stamp=""):
+        """
+        Fit every cohort of every race over the snapshot's arrays; stamp is
+        the get_data_stamp() of the data it was built from.
+        """
+        fits = {}
+        for race_id in np.unique(snapshot.race_id).tolist():
+            race = snapshot.race_slice(race_id)
+            half1 = snapshot.half1[race].astype(np.float64)
+            finish = snapshot.finish[race].astype(np.float64)
+            genders = snapshot.gender[race]
+            divisions = snapshot.division[race]
+
+            cohorts = [(None, None, np.ones(len(half1), dtype=bool))]
+            for g in np.unique(genders):
+                in_gender = genders == g
+                cohorts.append((snapshot.genders[g], None, in_gender))
+                for d in np.unique(divisions[in_gender]):
+                    in_division = in_gender & (divisions == d)
+                    cohorts.append(
+                        (snapshot.genders[g], snapshot.divisions[d], in_division)
+                    )
+
+            for gender, division, mask in cohorts:
+                if np.count_nonzero(mask) >= MIN_COHORT_SIZE:
+                    key = cohort_key(race_id, gender, division)
+                    fits[key] = fit_line(half1[mask], finish[mask])
+
+        return cls(snapshot.version, fits, stamp)
+
+    def half1_range(self, race_id):
+        """
+        Return the (shortest, longest) first half of a race's runners, the
+        range its predictions are fitted over, or None if it has no fit.
+        """
+        fit = self.fits.get(cohort_key(race_id))
+        return (fit["half1_min"], fit["half1_max"]) if fit else None
+
+    def predict(self, half1, race_id, gender=None, division=None):
+        """
+        Return (cohort, predicted, low, high) finish seconds for a
+        first-half split of half1 seconds in a race, using the narrowest
+        cohort with a fit, or None if there is no fit at all. The interval
+        is clamped at zero.
+        """
+        for gender, division in ((gender, division), (gender, None), (None, None)):
+            fit = self.fits.get(cohort_key(race_id, gender, division))
+            if fit is not None:
+                predicted = fit["intercept"] + fit["slope"] * half1
+                cohort = f"{gender or ''} {division or ''}".strip() or "overall"
+                return (
+                    cohort,
+                    predicted,
+                    max(predicted + fit["low"], 0),
+                    max(predicted + fit["high"], 0),
+                )
+        return None
+
+    def save(self, filename=PREDICTOR_FILENAME):
+        """Write the fitted predictor to filename as JSON."""
+        filename = Path(filename)
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        tmp = filename.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump(
+                {
+                    "format": FILE_FORMAT,
+                    "version": self.version,
+                    "stamp": self.stamp,
+                    "fits": self.fits,
+                },
+                f,
+            )
+        os.replace(tmp, filename)
+
+    @classmethod
+    def load(cls, filename=PREDICTOR_FILENAME):
+        """Read a predictor saved by save(), or return None if there is none."""
+        try:
+            with open(filename) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != FILE_FORMAT:
+            return None
+        return cls(data["version"], data["fits"], data["stamp"])
+
+
+_predictor = None
+_lock = threading.Lock()
+
+
+def get_predictor():
+    """
+    Return the FinishTimePredictor for the current Result data, fitting it
+    once per data version. A fit saved by another process for the same data
+    (same version and stamp, so not another database's) is reused instead of
+    refitting. If the fit cannot be saved, e.g. on a read-only install, it
+    is only kept in memory.
+    """
+    global _predictor
+
+    snapshot = get_snapshot()
+    if _predictor is not None and _predictor.version == snapshot.version:
+        return _predictor
+
+    with _lock:
+        if _predictor is None or _predictor.version != snapshot.version:
+            stamp = get_data_stamp()
+            predictor = FinishTimePredictor.load()
+            if (
+                predictor is None
+                or not stamp
+                or (predictor.version, predictor.stamp) != (snapshot.version, stamp)
+            ):
+                predictor = FinishTimePredictor.fit(snapshot, stamp)
+                try:
+                    predictor.save()
+                except OSError:
+                    pass
+            _predictor = predictor
+        return _predictor
@@ -0,0 +1,312 @@
+# marathon_analytics/snapshot.py
+
+import threading
+import time
+
+import numpy as np
+
+from .models import Result, get_data_version
+
+# seconds between checks of the data version by a cached snapshot
+VERSION_CHECK_INTERVAL = 5.0
+
+# integer-seconds timing columns, by their name in the snapshot
+TIME_COLUMNS = {
+    "finish": "finish_seconds",
+    "half1": "half1_seconds",
+    "half2": "half2_seconds",
+    "start_tod": "start_seconds",
+    "finish_tod": "finish_tod_seconds",
+}
+
+# integer columns copied into the snapshot as they are
+INT_COLUMNS = [
+    "race_id",
+    "id",
+    "bib",
+    "place_overall",
+    "place_gender",
+    "place_division",
+]
+
+# columns describing a runner's pacing profile, used for similarity search
+PROFILE_COLUMNS = ["half1", "half2", "finish", "start_tod"]
+
+# text columns stored as integer codes into a sorted array of labels
+CATEGORY_COLUMNS = ["gender", "division"]
+
+
+class ResultSnapshot:
+    """
+    Read-only columnar copy of the Result table held as NumPy arrays.
+
+    Every column is an array of the same length, one entry per runner:
+    race_id, id, bib and the places as integers, the timing columns (finish,
+    half1, half2, start_tod, finish_tod) as integer seconds, and
+    gender/division as integer codes into the sorted label arrays
+    genders/divisions. Rows are ordered by race, so each race's runners are
+    one contiguous slice of every column.
+    """
+
+    def __init__(self, version, columns):
+        self.version = version
+        for name, values in columns.items():
+            setattr(self, name, values)
+        self._id_order = np.argsort(self.id)
+        self._sorted = {}
+        self._profiles = None
+        self._timelines = {}
+        self._start_orders = {}
+
+    @classmethod
+    def build(cls, version):
+        """Read the whole Result table once and return it as a snapshot."""
+        fields = INT_COLUMNS + CATEGORY_COLUMNS + list(TIME_COLUMNS.values())
+        rows = list(Result.objects.order_by("race_id", "id").values_list(*fields))
+        rows_by_field = dict(zip(fields, zip(*rows))) if rows else {}
+
+        columns = {}
+        for name in INT_COLUMNS:
+            columns[name] = np.array(rows_by_field.get(name, ()), dtype=np.int64)
+        for name in CATEGORY_COLUMNS:
+            labels, codes = np.unique(
+                np.array(rows_by_field.get(name, ()), dtype=str), return_inverse=True
+            )
+            columns[name + "s"] = labels
+            columns[name] = codes.astype(np.int16)
+        for name, field in TIME_COLUMNS.items():
+            columns[name] = np.array(rows_by_field.get(field, ()), dtype=np.int32)
+
+        return cls(version, columns)
+
+    def __len__(self):
+        return len(self.id)
+
+    def position(self, pk):
+        """Return the array position of the Result with primary key pk."""
+        i = np.searchsorted(self.id, pk, sorter=self._id_order)
+        if i == len(self.id) or self.id[self._id_order[i]] != pk:
+            raise KeyError(pk)
+        return int(self._id_order[i])
+
+    def race_slice(self, race_id):
+        """Return the slice of positions holding the runners of one race."""
+        return slice(
+            int(np.searchsorted(self.race_id, race_id, side="left")),
+            int(np.searchsorted(self.race_id, race_id, side="right")),
+        )
+
+    def mask(self, race_id=None, gender=None, division=None):
+        """
+        Return a boolean array selecting runners of the given race, gender
+        and/or division (None means no restriction; unknown labels match
+        nobody).
+        """
+        if race_id is None:
+            selected = np.ones(len(self), dtype=bool)
+        else:
+            selected = np.zeros(len(self), dtype=bool)
+            selected[self.race_slice(race_id)] = True
+        for column, labels, value in (
+            (self.gender, self.genders, gender),
+            (self.division, self.divisions, division),
+        ):
+            if value is None:
+                continue
+            code = np.searchsorted(labels, value)
+            if code == len(labels) or labels[code] != value:
+                return np.zeros(len(self), dtype=bool)
+            selected &= column == code
+        return selected
+
+    def column(self, name, mask=None):
+        """Return the named column, restricted to mask if given."""
+        values = getattr(self, name)
+        return values if mask is None else values[mask]
+
+    def count(self, mask=None):
+        """Return the number of runners selected by mask."""
+        return len(self) if mask is None else int(np.count_nonzero(mask))
+
+    def mean(self, name, mask=None):
+        """Return the mean of a column over the selected runners (None if empty)."""
+        values = self.column(name, mask)
+        return float(values.mean()) if len(values) else None
+
+    def percentile(self, name, q, mask=None):
+        """Return the q-th percentile(s) of a column (None if empty)."""
+        values = self.column(name, mask)
+        return np.percentile(values, q) if len(values) else None
+
+    def histogram(self, name, bins, mask=None):
+        """Return (counts, bin_edges) of a column over the selected runners."""
+        return np.histogram(self.column(name, mask), bins=bins)
+
+    def group_counts(self, by, mask=None):
+        """Return {label: count} for a category column ("gender"/"division")."""
+        labels = getattr(self, by + "s")
+        counts = np.bincount(self.column(by, mask), minlength=len(labels))
+        return {str(label): int(n) for label, n in zip(labels, counts) if n}
+
+    def sorted_column(self, name, race_id=None, gender=None, division=None):
+        """
+        Return the named column for one race/gender/division cohort, sorted
+        ascending. Each cohort is sorted once and kept with the snapshot;
+        empty cohorts (e.g. of labels that do not exist, straight from a
+        request) are not kept, so they cannot grow the cache without bound.
+        """
+        key = (name, race_id, gender, division)
+        if key not in self._sorted:
+            mask = self.mask(race_id, gender, division)
+            values = np.sort(self.column(name, mask))
+            if not len(values):
+                return values
+            self._sorted[key] = values
+        return self._sorted[key]
+
+    def rank(self, name, value, race_id=None, gender=None, division=None):
+        """
+        Return (rank, percentile, cohort size) that value would earn among a
+        cohort when ranked ascending on the named column: rank counts 1 plus
+        everyone strictly lower, percentile is the percentage of the cohort
+        strictly higher. Binary search over the presorted cohort, O(log n).
+        """
+        values = self.sorted_column(name, race_id, gender, division)
+        n = len(values)
+        lower = int(np.searchsorted(values, value, side="left"))
+        higher = n - int(np.searchsorted(values, value, side="right"))
+        percentile = round(100.0 * higher / n, 2) if n else None
+        return lower + 1, percentile, n
+
+    def profiles(self):
+        """
+        Return the pacing profiles as an (n, len(PROFILE_COLUMNS)) float32
+        matrix with every column scaled to zero mean and unit variance, built
+        once per snapshot.
+        """
+        if self._profiles is None:
+            matrix = np.column_stack(
+                [getattr(self, name) for name in PROFILE_COLUMNS]
+            ).astype(np.float32)
+            if len(matrix):
+                std = matrix.std(axis=0)
+                std[std == 0] = 1
+                matrix = (matrix - matrix.mean(axis=0)) / std
+            self._profiles = matrix
+        return self._profiles
+
+    def nearest(self, position, k):
+        """
+        Return the positions of the k runners in the same race whose pacing
+        profiles are closest to the runner at position, nearest first. The
+        distances are computed in one vectorized pass over the race's slice
+        and only the k best are sorted.
+        """
+        race = self.race_slice(self.race_id[position])
+        profiles = self.profiles()[race]
+        distances = ((profiles - profiles[position - race.start]) ** 2).sum(axis=1)
+        distances[position - race.start] = np.inf
+
+        k = min(k, len(distances) - 1)
+        if k <= 0:
+            return np.array([], dtype=np.intp)
+        best = np.argpartition(distances, k - 1)[:k]
+        return best[np.argsort(distances[best])] + race.start
+
+    def start_order(self, race_id):
+        """
+        Return (order, starts): the positions of one race's runners sorted by
+        start time of day, and their start times in that order. Sorted once
+        per race and snapshot.
+        """
+        if race_id not in self._start_orders:
+            race = self.race_slice(race_id)
+            order = np.argsort(self.start_tod[race], kind="stable") + race.start
+            self._start_orders[race_id] = (order, self.start_tod[order])
+        return self._start_orders[race_id]
+
+    def passing(self, position):
+        """
+        Return (passed, passed_by): the positions of the runners in the same
+        race that the runner at position passed (started strictly earlier and
+        finished strictly later) and was passed by (started strictly later and
+        finished strictly earlier), each ordered by finish time of day. With
+        the race sorted by start time, each side is one binary search and one
+        vectorized comparison of finish times.
+        """
+        order, starts = self.start_order(self.race_id[position])
+        start, finish = self.start_tod[position], self.finish_tod[position]
+
+        earlier = order[: np.searchsorted(starts, start, side="left")]
+        later = order[np.searchsorted(starts, start, side="right") :]
+        passed = earlier[self.finish_tod[earlier] > finish]
+        passed_by = later[self.finish_tod[later] < finish]
+
+        return (
+            passed[np.argsort(self.finish_tod[passed], kind="stable")],
+            passed_by[np.argsort(self.finish_tod[passed_by], kind="stable")],
+        )
+
+    def timeline(self, race_id):
+        """
+        Return (minutes, not_started, on_course, finished): for every minute
+        of one race's day from the first start to the last finish, the minute
+        (as minutes since midnight) and how many runners had not yet started,
+        were on the course, or had finished by the end of it. Computed once
+        per race and snapshot by counting start/finish events per minute and
+        taking cumulative sums.
+        """
+        if race_id not in self._timelines:
+            race = self.race_slice(race_id)
+            n = race.stop - race.start
+            if n:
+                start_minute = self.start_tod[race] // 60
+                finish_minute = self.finish_tod[race] // 60
+                first = int(start_minute.min())
+                size = int(finish_minute.max()) - first + 1
+
+                started = np.cumsum(np.bincount(start_minute - first, minlength=size))
+                finished = np.cumsum(np.bincount(finish_minute - first, minlength=size))
+                minutes = np.arange(first, first + size)
+                self._timelines[race_id] = (
+                    minutes,
+                    n - started,
+                    started - finished,
+                    finished,
+                )
+            else:
+                empty = np.array([], dtype=np.int64)
+                self._timelines[race_id] = (empty, empty, empty, empty)
+        return self._timelines[race_id]
+
+
+_snapshot = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    """
+    Return the process-wide ResultSnapshot, building it on first use and
+    rebuilding it once the data version has been bumped by a reload. The
+    version is checked at most every VERSION_CHECK_INTERVAL seconds.
+    """
+    global _snapshot, _checked_at
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return _snapshot
+
+    with _lock:
+        version = get_data_version()
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = ResultSnapshot.build(version)
+        _checked_at = now
+        return _snapshot
+
+
+def invalidate_snapshot():
+    """Drop this process's cached snapshot so the next use rebuilds it."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
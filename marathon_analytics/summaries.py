@@ -0,0 +1,84 @@
+# marathon_analytics/summaries.py
+
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+from django.db import transaction
+
+from .models import DivisionSummary, Race, Result, format_seconds
+
+# number of finishers kept on each division's leaderboard
+LEADERBOARD_SIZE = 10
+
+
+def summarize_division(race, gender, division, rows):
+    """
+    Return an unsaved DivisionSummary for one gender/division of race, from
+    its (id, bib, first_name, last_name, finish, half1, half2) rows sorted
+    by finish time.
+    """
+    finish = np.array([row[4] for row in rows])
+    half1 = np.array([row[5] for row in rows])
+    half2 = np.array([row[6] for row in rows])
+
+    leaders = [
+        {
+            "id": pk,
+            "bib": bib,
+            "name": f"{first_name} {last_name}",
+            "finish": format_seconds(seconds),
+        }
+        for pk, bib, first_name, last_name, seconds, _, _ in rows[:LEADERBOARD_SIZE]
+    ]
+
+    return DivisionSummary(
+        race=race,
+        gender=gender,
+        division=division,
+        runners=len(rows),
+        min_finish_seconds=int(finish[0]),
+        median_finish_seconds=int(round(np.median(finish))),
+        p90_finish_seconds=int(round(np.percentile(finish, 90))),
+        mean_half1_seconds=float(half1.mean()),
+        mean_half2_seconds=float(half2.mean()),
+        negative_split_ratio=float(np.count_nonzero(half2 < half1) / len(rows)),
+        leaders=leaders,
+    )
+
+
+def refresh_division_summaries(race=None):
+    """
+    Recompute and store the DivisionSummary rows of race (of every race if
+    race is None) in one pass over its results, read sorted by gender,
+    division and finish time. Returns the number of summaries stored.
+    """
+    if race is None:
+        return sum(refresh_division_summaries(race) for race in Race.objects.all())
+
+    rows = (
+        Result.objects.filter(race=race)
+        .order_by("gender", "division", "finish_seconds", "place_overall", "id")
+        .values_list(
+            "gender",
+            "division",
+            "id",
+            "bib",
+            "first_name",
+            "last_name",
+            "finish_seconds",
+            "half1_seconds",
+            "half2_seconds",
+        )
+    )
+
+    summaries = [
+        summarize_division(race, gender, division, [row[2:] for row in group])
+        for (gender, division), group in groupby(rows, key=itemgetter(0, 1))
+    ]
+
+    with transaction.atomic():
+        DivisionSummary.objects.filter(race=race).delete()
+        DivisionSummary.objects.bulk_create(summaries)
+
+    return len(summaries)
@@ -1,3 +1,886 @@
+# marathon_analytics/tests.py
+
+import json
+import os
+import random
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models import F
+from django.http import QueryDict
 from django.test import TestCase
 
-# Create your tests here.
+from . import predictor
+from .anomalies import update_split_anomalies
+from .loader import load_results, sync_results
+from .models import (
+    DivisionSummary,
+    Race,
+    RaceDashboard,
+    Result,
+    SplitAnomaly,
+    format_seconds,
+    get_data_stamp,
+    get_data_version,
+)
+from .pagination import KeysetPaginator
+from .passing import compute_passing_counts
+from .snapshot import get_snapshot
+from .views import search_filter
+
+HEADER = (
+    "BIB,First Name,Last Name,CTZ,City,State,Gender,Division,Place Overall,"
+    "Place Gender,Place Division,Start TOD,Finish TOD,Finish,HALF1,HALF2"
+)
+
+
+def hms(seconds):
+    """Format seconds as the H:MM:SS of the results file."""
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def csv_row(
+    bib, first="Ann", last="Smith", city="Boston", start=27000, finish=36000, half1=None
+):
+    """
+    Return one line of a results file; start/finish are seconds of the day,
+    half1 the first-half split (by default half the finish time).
+    """
+    duration = finish - start
+    if half1 is None:
+        half1 = duration // 2
+    return ",".join(
+        [
+            str(bib),
+            first,
+            last,
+            "USA",
+            city,
+            "MA",
+            "Female",
+            "F35-39",
+            str(bib),
+            str(bib),
+            str(bib),
+            hms(start),
+            hms(finish),
+            hms(duration),
+            hms(half1),
+            hms(duration - half1),
+        ]
+    )
+
+
+class ResultsFileMixin:
+    """Write results files for a test and load them into a Race."""
+
+    def setUp(self):
+        super().setUp()
+        self.race = Race.objects.create(name="Test Marathon", year=2024, slug="test")
+
+    def write_csv(self, rows):
+        """Write a results file of rows (csv_row() lines) and return its name."""
+        fd, filename = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join([HEADER, *rows]) + "\n")
+        self.addCleanup(os.remove, filename)
+        return filename
+
+    def load(self, rows):
+        return load_results(self.write_csv(rows), self.race)
+
+    def sync(self, rows):
+        return sync_results(self.write_csv(rows), self.race)
+
+
+class SearchFilterTests(ResultsFileMixin, TestCase):
+    """search_filter() prefixes over names and cities."""
+
+    def setUp(self):
+        super().setUp()
+        self.load(
+            [
+                csv_row(1, "Ann", "Smith", "San Francisco"),
+                csv_row(2, "Bob", "Van Dyke", "Boston"),
+                csv_row(3, "New", "Yorke", "Chicago"),
+                csv_row(4, "Cara", "Jones", "New York"),
+            ]
+        )
+
+    def search(self, q):
+        return set(
+            Result.objects.filter(search_filter(q)).values_list("bib", flat=True)
+        )
+
+    def test_bib(self):
+        self.assertEqual(self.search("3"), {3})
+
+    def test_non_ascii_digits(self):
+        # "²".isdigit() is true, but int() rejects it
+        self.assertEqual(self.search("²"), set())
+        response = self.client.get("/marathon_analytics/results", {"q": "²"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_single_word(self):
+        self.assertEqual(self.search("sm"), {1})
+        self.assertEqual(self.search("bos"), {2})
+        self.assertEqual(self.search("new"), {3, 4})
+
+    def test_first_and_last_name(self):
+        self.assertEqual(self.search("ann sm"), {1})
+
+    def test_multi_word_city(self):
+        self.assertEqual(self.search("san fr"), {1})
+        self.assertEqual(self.search("New  York"), {3, 4})
+        self.assertEqual(self.search("new york c"), set())
+
+    def test_multi_word_last_name(self):
+        self.assertEqual(self.search("van d"), {2})
+
+
+class SplitAnomalyReviewTests(ResultsFileMixin, TestCase):
+    """Reviewed split anomalies keep their mark across reloads."""
+
+    # runners 1 and 2 run a first half far faster than everyone else
+    ODD_BIBS = {1, 2}
+
+    def rows(self):
+        rows = []
+        for bib in range(1, 41):
+            duration = 14400 + 10 * bib
+            half1 = duration // 2 + 5 * (bib % 5)
+            if bib in self.ODD_BIBS:
+                half1 = duration // 4
+            rows.append(csv_row(bib, start=27000, finish=27000 + duration, half1=half1))
+        return rows
+
+    def flags(self):
+        return dict(
+            SplitAnomaly.objects.filter(race=self.race).values_list(
+                "result__bib", "reviewed"
+            )
+        )
+
+    def test_full_reload_keeps_reviewed_marks(self):
+        self.load(self.rows())
+        self.assertEqual(self.flags(), {1: False, 2: False})
+
+        SplitAnomaly.objects.filter(result__bib=1).update(reviewed=True)
+        self.load(self.rows())
+        self.assertEqual(self.flags(), {1: True, 2: False})
+
+    def test_redetection_keeps_reviewed_marks(self):
+        self.load(self.rows())
+        SplitAnomaly.objects.filter(result__bib=2).update(reviewed=True)
+        update_split_anomalies()
+        self.assertEqual(self.flags(), {1: False, 2: True})
+
+
+class PredictorCacheTests(ResultsFileMixin, TestCase):
+    """get_predictor() reuses only fits saved for the same data."""
+
+    def setUp(self):
+        super().setUp()
+        self.load(
+            [
+                csv_row(bib, start=27000, finish=27000 + 14400 + 60 * bib)
+                for bib in range(1, 41)
+            ]
+        )
+        predictor._predictor = None
+        self.addCleanup(setattr, predictor, "_predictor", None)
+        save = mock.patch.object(predictor.FinishTimePredictor, "save")
+        self.save = save.start()
+        self.addCleanup(save.stop)
+
+    def saved(self, stamp):
+        """Pretend a fit for the current version and stamp was saved."""
+        saved = predictor.FinishTimePredictor(get_data_version(), {}, stamp)
+        load = mock.patch.object(
+            predictor.FinishTimePredictor, "load", return_value=saved
+        )
+        load.start()
+        self.addCleanup(load.stop)
+        return saved
+
+    def test_reuses_fit_of_same_data(self):
+        saved = self.saved(get_data_stamp())
+        self.assertIs(predictor.get_predictor(), saved)
+        self.save.assert_not_called()
+
+    def test_refits_over_fit_of_other_database(self):
+        saved = self.saved("2000-01-01T00:00:00+00:00")
+        fitted = predictor.get_predictor()
+        self.assertIsNot(fitted, saved)
+        self.assertTrue(fitted.fits)
+        self.assertEqual(fitted.stamp, get_data_stamp())
+        self.save.assert_called_once()
+
+    def test_unwritable_fit_file(self):
+        self.saved("")
+        self.save.side_effect = OSError("read-only file system")
+        response = self.client.get(
+            "/marathon_analytics/predict", {"half1": "2:05:00", "race": "test"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("finish", response.json())
+
+
+class PredictFinishTests(ResultsFileMixin, TestCase):
+    """The predict endpoint only predicts within the fitted first halves."""
+
+    def setUp(self):
+        super().setUp()
+        # first halves from 1:50:20 to 2:03:20, finishes 4:00:40 to 4:26:40
+        self.load(
+            [
+                csv_row(
+                    bib,
+                    start=27000,
+                    finish=27000 + 14400 + 40 * bib,
+                    half1=6600 + 20 * bib + 7 * (bib % 3),
+                )
+                for bib in range(1, 41)
+            ]
+        )
+        predictor._predictor = None
+        self.addCleanup(setattr, predictor, "_predictor", None)
+        save = mock.patch.object(predictor.FinishTimePredictor, "save")
+        save.start()
+        self.addCleanup(save.stop)
+
+    def predict(self, half1):
+        return self.client.get(
+            "/marathon_analytics/predict", {"half1": half1, "race": "test"}
+        )
+
+    def test_prediction(self):
+        data = self.predict("1:55:00").json()
+        self.assertEqual(data["half1"], "1:55:00")
+        self.assertLessEqual(data["low"], data["finish"])
+        self.assertLessEqual(data["finish"], data["high"])
+
+    def test_rejects_zero_and_unfitted_first_halves(self):
+        for half1 in ("0:00:00", "0:30:00", "3:00:00", "1:5x:00"):
+            response = self.predict(half1)
+            self.assertEqual(response.status_code, 400, half1)
+            self.assertIn("error", response.json())
+
+    def test_format_seconds(self):
+        self.assertEqual(format_seconds(3723), "1:02:03")
+        self.assertEqual(format_seconds(-173), "-0:02:53")
+        self.assertEqual(format_seconds(0), "0:00:00")
+
+
+class RankLookupTests(ResultsFileMixin, TestCase):
+    """The rank endpoint and the snapshot's cache of sorted cohorts."""
+
+    def setUp(self):
+        super().setUp()
+        self.load(
+            [
+                csv_row(bib, start=27000, finish=27000 + 14400 + 60 * bib)
+                for bib in range(1, 11)
+            ]
+        )
+
+    def rank(self, **params):
+        return self.client.get(
+            "/marathon_analytics/rank", {"time": "4:05:00", "race": "test", **params}
+        )
+
+    def test_rank(self):
+        data = self.rank(gender="Female").json()
+        self.assertEqual(
+            data["overall"], {"rank": 5, "percentile": 50.0, "field_size": 10}
+        )
+        self.assertEqual(data["gender"]["field_size"], 10)
+
+    def test_unknown_labels_are_not_cached(self):
+        cached = len(get_snapshot()._sorted)
+        for i in range(20):
+            data = self.rank(gender="x{}".format(i), division="y{}".format(i)).json()
+            self.assertEqual(data["gender"]["field_size"], 0)
+            self.assertEqual(data["division"]["field_size"], 0)
+        self.assertEqual(len(get_snapshot()._sorted), cached + 1)
+
+    def test_unknown_race_is_json(self):
+        for url, param in (("rank", "time"), ("predict", "half1")):
+            response = self.client.get(
+                "/marathon_analytics/" + url, {param: "2:00:00", "race": "nope"}
+            )
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json(), {"error": "no such race"})
+
+
+def brute_force_passing_counts(starts, finishes):
+    """compute_passing_counts() by comparing every pair of runners."""
+    n = len(starts)
+    passed = [
+        sum(starts[j] < starts[i] and finishes[j] > finishes[i] for j in range(n))
+        for i in range(n)
+    ]
+    passed_by = [
+        sum(starts[j] > starts[i] and finishes[j] < finishes[i] for j in range(n))
+        for i in range(n)
+    ]
+    return passed, passed_by
+
+
+class PassingCountTests(TestCase):
+    """compute_passing_counts() against the O(n^2) definition."""
+
+    def test_small_cases(self):
+        self.assertEqual(compute_passing_counts([], []), ([], []))
+        self.assertEqual(compute_passing_counts([1], [5]), ([0], [0]))
+        # the later starter finishes first: one pass each way
+        self.assertEqual(compute_passing_counts([1, 2], [6, 5]), ([0, 1], [1, 0]))
+        # tied starts or finishes are not passes
+        self.assertEqual(compute_passing_counts([1, 1], [6, 5]), ([0, 0], [0, 0]))
+        self.assertEqual(compute_passing_counts([1, 2], [5, 5]), ([0, 0], [0, 0]))
+
+    def test_matches_brute_force_with_ties(self):
+        rng = random.Random(412)
+        for n in (2, 10, 50, 200):
+            # few distinct values, so many starts and finishes are tied
+            starts = [rng.randrange(n // 2 + 1) for _ in range(n)]
+            finishes = [s + rng.randrange(n // 2 + 1) for s in starts]
+            self.assertEqual(
+                compute_passing_counts(starts, finishes),
+                brute_force_passing_counts(starts, finishes),
+            )
+
+
+class KeysetPaginatorTests(ResultsFileMixin, TestCase):
+    """Walking a KeysetPaginator forwards and backwards over all its pages."""
+
+    def setUp(self):
+        super().setUp()
+        self.load(
+            [
+                csv_row(bib, city="Chicago" if bib % 3 else "Boston")
+                for bib in range(1, 26)
+            ]
+        )
+        # pairs of runners share a place, so the id breaks the ties
+        Result.objects.update(place_overall=(F("bib") + 1) / 2)
+        self.results = Result.objects.filter(race=self.race)
+
+    def paginator(self, queryset):
+        return KeysetPaginator(queryset, ["place_overall", "id"], 10)
+
+    def expected(self, queryset):
+        return list(queryset.order_by("place_overall", "id"))
+
+    def walk_forward(self, paginator):
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        return pages
+
+    def walk_backward(self, paginator, last):
+        pages = [last]
+        while pages[0].has_previous():
+            pages.insert(0, paginator.page(before=pages[0].prev_cursor))
+        return pages
+
+    def rows(self, pages):
+        return [obj for page in pages for obj in page.object_list]
+
+    def test_forward_and_backward(self):
+        for queryset in (self.results, self.results.filter(city="Chicago")):
+            paginator = self.paginator(queryset)
+            forward = self.walk_forward(paginator)
+            self.assertEqual(self.rows(forward), self.expected(queryset))
+            self.assertFalse(forward[0].has_previous())
+            self.assertTrue(forward[0].has_next())
+            self.assertTrue(forward[-1].has_previous())
+            self.assertFalse(forward[-1].has_next())
+
+            backward = self.walk_backward(paginator, forward[-1])
+            self.assertEqual(self.rows(backward), self.expected(queryset))
+            self.assertFalse(backward[0].has_previous())
+            self.assertEqual(
+                [len(page.object_list) for page in backward],
+                [len(page.object_list) for page in forward],
+            )
+
+    def test_single_page(self):
+        page = self.paginator(self.results.filter(bib__lte=10)).page()
+        self.assertEqual(len(page.object_list), 10)
+        self.assertFalse(page.has_previous())
+        self.assertFalse(page.has_next())
+
+    def test_malformed_cursor_gives_first_page(self):
+        paginator = self.paginator(self.results)
+        first = paginator.page().object_list
+        for cursor in ("abc", "1", "1.2.3", "1.x"):
+            self.assertEqual(paginator.page(after=cursor).object_list, first)
+            self.assertEqual(paginator.page(before=cursor).object_list, first)
+
+
+class SyncResultsTests(ResultsFileMixin, TestCase):
+    """Incremental loads write, and count, only what changed."""
+
+    def row(self, bib, first="Ann", start=27000):
+        duration = 14400 + 60 * bib
+        # runner 1's first half is far faster than everyone else's
+        half1 = duration // 4 if bib == 1 else duration // 2 + 5 * (bib % 5)
+        return csv_row(bib, first, start=start, finish=start + duration, half1=half1)
+
+    def setUp(self):
+        super().setUp()
+        self.load([self.row(bib) for bib in range(1, 41)])
+        self.assertEqual(SplitAnomaly.objects.filter(result__bib=1).count(), 1)
+
+    def passing_counts(self):
+        return dict(
+            Result.objects.filter(race=self.race)
+            .order_by("bib")
+            .values_list("bib", "runners_passed")
+        )
+
+    def test_counts(self):
+        rows = [self.row(bib) for bib in range(3, 40)]
+        rows += [self.row(2, first="Bea"), self.row(41), self.row(3)]
+        stats = self.sync(rows)
+
+        self.assertEqual(
+            (stats.created, stats.updated, stats.deleted, stats.unchanged),
+            (1, 1, 2, 37),
+        )
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual(stats.skip_reasons, {"duplicate bib": 1})
+        self.assertEqual(
+            set(Result.objects.values_list("bib", flat=True)), set(range(2, 42)) - {40}
+        )
+        self.assertEqual(Result.objects.get(bib=2).first_name, "Bea")
+        self.assertFalse(SplitAnomaly.objects.exists())
+
+    def test_derived_data_refreshed(self):
+        self.sync([self.row(1, first="Bea")] + [self.row(b) for b in range(2, 41)])
+        leaders = DivisionSummary.objects.get(race=self.race).leaders
+        self.assertEqual(leaders[0]["name"], "Bea Smith")
+        self.assertEqual(
+            SplitAnomaly.objects.get(race=self.race).result.first_name, "Bea"
+        )
+
+    def test_unchanged_file(self):
+        stats = self.sync([self.row(bib) for bib in range(1, 41)])
+        self.assertEqual(
+            (stats.created, stats.updated, stats.deleted, stats.unchanged),
+            (0, 0, 0, 40),
+        )
+
+    def test_passing_counts_only_recomputed_when_times_change(self):
+        with mock.patch(
+            "marathon_analytics.loader.update_passing_counts"
+        ) as update_passing_counts:
+            self.sync([self.row(bib, first="Bea") for bib in range(1, 41)])
+        update_passing_counts.assert_not_called()
+
+        self.assertEqual(set(self.passing_counts().values()), {0})
+        # runner 1 now starts ten minutes after everyone else, so passes
+        # the runners who still finish after them
+        stats = self.sync(
+            [self.row(1, first="Bea", start=27000 + 600)]
+            + [self.row(bib, first="Bea") for bib in range(2, 41)]
+        )
+        self.assertEqual(stats.updated, 1)
+        starts, finishes = zip(
+            *Result.objects.filter(race=self.race)
+            .order_by("bib")
+            .values_list("start_seconds", "finish_tod_seconds")
+        )
+        passed, _ = compute_passing_counts(starts, finishes)
+        self.assertEqual(list(self.passing_counts().values()), passed)
+        self.assertEqual(self.passing_counts()[1], 29)
+
+
+class DashboardTests(ResultsFileMixin, TestCase):
+    """Dashboard figures are stored without plotly's template."""
+
+    def setUp(self):
+        super().setUp()
+        self.load([csv_row(bib, finish=36000 + 60 * bib) for bib in range(1, 21)])
+
+    def test_template_stripped_and_restored(self):
+        figures = RaceDashboard.objects.get(race=self.race).figures
+        self.assertEqual(len(figures), 4)
+        for figure in figures.values():
+            self.assertNotIn("template", figure["layout"])
+
+        response = self.client.get("/marathon_analytics/dashboard", {"race": "test"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"template"', response.context["graph_div_finish_histogram"])
+
+
+class MultiRaceTests(ResultsFileMixin, TestCase):
+    """Loading one race leaves the others alone; the snapshot keeps them apart."""
+
+    def rows(self, n, first="Ann", start=27000):
+        rows = []
+        for bib in range(1, n + 1):
+            duration = 14400 + 60 * bib
+            # runner 1's first half is far faster than everyone else's
+            half1 = duration // 4 if bib == 1 else duration // 2 + 5 * (bib % 5)
+            rows.append(
+                csv_row(bib, first, start=start, finish=start + duration, half1=half1)
+            )
+        return rows
+
+    def setUp(self):
+        super().setUp()
+        self.other = Race.objects.create(name="Other Marathon", year=2023, slug="other")
+        load_results(self.write_csv(self.rows(30, "Cal", start=28800)), self.other)
+        self.load(self.rows(40))
+
+    def stored(self, race):
+        """Everything load_results writes for race."""
+        return (
+            list(
+                Result.objects.filter(race=race)
+                .order_by("bib")
+                .values_list("id", "bib", "first_name", "runners_passed")
+            ),
+            list(
+                DivisionSummary.objects.filter(race=race).values_list(
+                    "id", "runners", "median_finish_seconds", "leaders"
+                )
+            ),
+            list(
+                SplitAnomaly.objects.filter(race=race).values_list(
+                    "id", "result_id", "kind", "reviewed"
+                )
+            ),
+            RaceDashboard.objects.get(race=race).figures,
+        )
+
+    def test_load_leaves_other_race_untouched(self):
+        other = self.stored(self.other)
+        self.assertEqual(len(other[0]), 30)
+        self.assertEqual(len(other[2]), 1)
+        SplitAnomaly.objects.filter(race=self.other).update(reviewed=True)
+        other = self.stored(self.other)
+
+        self.load(self.rows(25, "Bea"))
+        self.assertEqual(self.stored(self.other), other)
+        self.assertEqual(Result.objects.filter(race=self.race).count(), 25)
+        self.assertEqual(
+            set(Result.objects.filter(race=self.race).values_list("first_name")),
+            {("Bea",)},
+        )
+
+    def test_race_slice(self):
+        snapshot = get_snapshot()
+        self.assertEqual(len(snapshot), 70)
+        for race, n in ((self.race, 40), (self.other, 30)):
+            race_slice = snapshot.race_slice(race.pk)
+            self.assertEqual(race_slice.stop - race_slice.start, n)
+            self.assertEqual(set(snapshot.race_id[race_slice].tolist()), {race.pk})
+            self.assertEqual(
+                sorted(snapshot.id[race_slice].tolist()),
+                sorted(Result.objects.filter(race=race).values_list("id", flat=True)),
+            )
+        self.assertEqual(
+            snapshot.race_slice(max(self.race.pk, self.other.pk) + 1), slice(70, 70)
+        )
+
+    def test_nearest_stays_in_race(self):
+        snapshot = get_snapshot()
+        for race in (self.race, self.other):
+            race_slice = snapshot.race_slice(race.pk)
+            for position in range(race_slice.start, race_slice.stop):
+                nearest = snapshot.nearest(position, 50)
+                self.assertEqual(len(nearest), race_slice.stop - race_slice.start - 1)
+                self.assertNotIn(position, nearest.tolist())
+                self.assertEqual(set(snapshot.race_id[nearest].tolist()), {race.pk})
+
+    def test_timeline(self):
+        snapshot = get_snapshot()
+        for race in (self.race, self.other):
+            minutes, not_started, on_course, finished = snapshot.timeline(race.pk)
+            times = list(
+                Result.objects.filter(race=race).values_list(
+                    "start_seconds", "finish_tod_seconds"
+                )
+            )
+            self.assertEqual(minutes[0], min(start for start, _ in times) // 60)
+            self.assertEqual(minutes[-1], max(finish for _, finish in times) // 60)
+            for i in (0, len(minutes) // 3, len(minutes) // 2, len(minutes) - 1):
+                minute = minutes[i]
+                expected = (
+                    sum(start // 60 > minute for start, _ in times),
+                    sum(
+                        start // 60 <= minute < finish // 60 for start, finish in times
+                    ),
+                    sum(finish // 60 <= minute for _, finish in times),
+                )
+                self.assertEqual(
+                    (not_started[i], on_course[i], finished[i]), expected, minute
+                )
+
+
+class ResultsExportTests(ResultsFileMixin, TestCase):
+    """The CSV and NDJSON exports of the filtered results list."""
+
+    def row(self, bib, last, city, gender, division):
+        fields = csv_row(bib, last=last, city=city, finish=36000 + 60 * bib).split(",")
+        fields[6], fields[7] = gender, division
+        return ",".join(fields)
+
+    def setUp(self):
+        super().setUp()
+        self.rows = [
+            self.row(1, "Smith", "Boston", "Female", "F35-39"),
+            self.row(2, "Smith", "Boston", "Male", "M35-39"),
+            self.row(3, "Jones", "Boston", "Male", "M35-39"),
+            self.row(4, "Smith", "Quincy", "Male", "M40-44"),
+            self.row(5, "Smith", "Boston", "Male", "M40-44"),
+        ]
+        self.load(self.rows)
+        other = Race.objects.create(name="Other Marathon", year=2023, slug="other")
+        load_results(
+            self.write_csv([self.row(6, "Smith", "Boston", "Male", "M35-39")]), other
+        )
+
+    def export(self, path, **params):
+        response = self.client.get(f"/marathon_analytics/{path}", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_csv_matches_results_file(self):
+        lines = self.export("results.csv", race="test")
+        self.assertEqual(lines[0], HEADER)
+        self.assertEqual(lines[1:], self.rows)
+
+    def test_filters(self):
+        lines = self.export(
+            "results.csv", race="test", city="Boston", q="Smith", gender="Male"
+        )
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], ["2", "5"])
+
+        lines = self.export("results.csv", race="test", q="smith", division="M40-44")
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], ["4", "5"])
+
+        lines = self.export("results.csv", race="other")
+        self.assertEqual([line.split(",")[0] for line in lines[1:]], ["6"])
+
+    def test_ndjson(self):
+        rows = [
+            json.loads(line)
+            for line in self.export("results.ndjson", race="test", gender="Male")
+        ]
+        self.assertEqual([row["bib"] for row in rows], [2, 3, 4, 5])
+        self.assertEqual(rows[0]["last_name"], "Smith")
+        self.assertEqual(rows[0]["time_finish"], "02:32:00")
+
+    def test_csv_round_trip(self):
+        lines = self.export("results.csv", race="test")
+        copy = Race.objects.create(name="Copy Marathon", year=2022, slug="copy")
+        fd, filename = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        self.addCleanup(os.remove, filename)
+
+        stats = load_results(filename, copy)
+        self.assertEqual(stats.skipped, 0)
+        # the export is the file it was loaded from, row hashes and all
+        self.assertEqual(sync_results(filename, self.race).unchanged, 5)
+        fields = [field.name for field in Result._meta.concrete_fields]
+        fields = [field for field in fields if field not in ("id", "race")]
+        self.assertEqual(
+            list(Result.objects.filter(race=copy).order_by("bib").values_list(*fields)),
+            list(
+                Result.objects.filter(race=self.race)
+                .order_by("bib")
+                .values_list(*fields)
+            ),
+        )
+
+
+class FacetTests(ResultsFileMixin, TestCase):
+    """Facet counts and the links that select and clear facet options."""
+
+    def row(self, bib, ctz, state, gender, division):
+        fields = csv_row(bib, finish=36000 + 60 * bib).split(",")
+        fields[3], fields[5], fields[6], fields[7] = ctz, state, gender, division
+        return ",".join(fields)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.load(
+            [
+                self.row(1, "USA", "MA", "Female", "F35-39"),
+                self.row(2, "USA", "MA", "Male", "M35-39"),
+                self.row(3, "CAN", "ON", "Male", "M35-39"),
+                self.row(4, "USA", "NH", "Male", "M40-44"),
+                self.row(5, "USA", "MA", "Female", "F40-44"),
+                self.row(6, "USA", "MA", "Male", "M40-44"),
+            ]
+        )
+        response = self.client.get(
+            "/marathon_analytics/results",
+            {"race": "test", "q": "Smith", "gender": "Male", "state": "MA"},
+        )
+        self.facets = {facet["label"]: facet for facet in response.context["facets"]}
+
+    def test_counts_ignore_own_selection(self):
+        counts = {
+            label: [(o["value"], o["count"]) for o in facet["options"]]
+            for label, facet in self.facets.items()
+        }
+        self.assertEqual(
+            counts,
+            {
+                # state=MA only
+                "Gender": [("Female", 2), ("Male", 2)],
+                # gender=Male and state=MA
+                "Division": [("M35-39", 1), ("M40-44", 1)],
+                # gender=Male only
+                "State": [("MA", 2), ("NH", 1), ("ON", 1)],
+                "Citizenship": [("USA", 2)],
+            },
+        )
+        self.assertEqual(self.facets["Gender"]["selected"], "Male")
+        self.assertEqual(
+            [o["value"] for o in self.facets["Gender"]["options"] if o["selected"]],
+            ["Male"],
+        )
+
+    def test_queries_keep_other_filters(self):
+        query = QueryDict(self.facets["Gender"]["clear_query"])
+        self.assertEqual(query.dict(), {"race": "test", "q": "Smith", "state": "MA"})
+
+        query = QueryDict(self.facets["State"]["options"][1]["query"])
+        self.assertEqual(
+            query.dict(),
+            {"race": "test", "q": "Smith", "gender": "Male", "state": "NH"},
+        )
+
+        query = QueryDict(self.facets["Division"]["options"][0]["query"])
+        self.assertEqual(
+            query.dict(),
+            {
+                "race": "test",
+                "q": "Smith",
+                "gender": "Male",
+                "state": "MA",
+                "division": "M35-39",
+            },
+        )
+        query = QueryDict(self.facets["Division"]["clear_query"])
+        self.assertEqual(
+            query.dict(),
+            {"race": "test", "q": "Smith", "gender": "Male", "state": "MA"},
+        )
+
+
+class PassingPagesTests(ResultsFileMixin, TestCase):
+    """The passed/passed_by pages list as many runners as were counted."""
+
+    def setUp(self):
+        super().setUp()
+        rng = random.Random(15)
+        rows = []
+        for bib in range(1, 121):
+            # starts and finishes on a coarse grid, so many of them tie
+            start = 27000 + 30 * rng.randrange(40)
+            rows.append(
+                csv_row(bib, start=start, finish=start + 60 * rng.randrange(200, 300))
+            )
+        self.load(rows)
+
+    def test_lists_match_stored_counts(self):
+        snapshot = get_snapshot()
+        results = Result.objects.filter(race=self.race)
+        self.assertTrue(any(r.runners_passed > 50 for r in results))
+        self.assertTrue(any(r.runners_passed_by > 50 for r in results))
+        for r in results:
+            passed, passed_by = snapshot.passing(snapshot.position(r.pk))
+            self.assertEqual(
+                (len(passed), len(passed_by)),
+                (r.runners_passed, r.runners_passed_by),
+                r.bib,
+            )
+
+        # the runners who passed, and were passed by, the most, over pages
+        busiest = [
+            results.order_by("-runners_passed").first(),
+            results.order_by("-runners_passed_by").first(),
+        ]
+        for r in busiest:
+            for direction, count in (
+                ("passed", r.runners_passed),
+                ("passed_by", r.runners_passed_by),
+            ):
+                response = self.client.get(
+                    f"/marathon_analytics/result/{r.pk}/{direction}"
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context["paginator"].count, count)
+                self.assertEqual(len(response.context["results"]), min(count, 50))
+
+
+class DivisionSummaryTests(ResultsFileMixin, TestCase):
+    """Division summaries of a small division worked out by hand."""
+
+    def setUp(self):
+        super().setUp()
+        rows = []
+        for bib in range(1, 13):
+            # bib 12 is fastest at 4:00:00, each lower bib 10 minutes slower,
+            # except that bib 6 ties bib 5 at 5:10:00
+            duration = 14400 + 600 * (12 - (5 if bib == 6 else bib))
+            # bibs 3, 6, 9 and 12 run the second half faster
+            half1 = duration // 2 + (60 if bib % 3 == 0 else -60)
+            rows.append(
+                csv_row(bib, first=f"R{bib}", finish=27000 + duration, half1=half1)
+            )
+        for bib in (13, 14):
+            fields = csv_row(bib, finish=27000 + 12000).split(",")
+            fields[6], fields[7] = "Male", "M40-44"
+            rows.append(",".join(fields))
+        self.load(rows)
+
+    def test_summary(self):
+        summary = DivisionSummary.objects.get(
+            race=self.race, gender="Female", division="F35-39"
+        )
+        self.assertEqual(summary.runners, 12)
+        self.assertEqual(summary.min_finish_seconds, 14400)
+        # between the 6th (4:50:00) and 7th (5:10:00) finishers
+        self.assertEqual(summary.median_finish_seconds, 18000)
+        # 9/10 of the way from the 10th (5:30:00) to the 11th (5:40:00)
+        self.assertEqual(summary.p90_finish_seconds, 20340)
+        self.assertEqual(summary.mean_half1_seconds, 8855.0)
+        self.assertEqual(summary.mean_half2_seconds, 8895.0)
+        self.assertAlmostEqual(summary.negative_split_ratio, 4 / 12)
+
+        # ten leaders, the tie broken by overall place
+        self.assertEqual(
+            [leader["bib"] for leader in summary.leaders],
+            [12, 11, 10, 9, 8, 7, 5, 6, 4, 3],
+        )
+        self.assertEqual(
+            summary.leaders[0],
+            {
+                "id": Result.objects.get(bib=12).pk,
+                "bib": 12,
+                "name": "R12 Smith",
+                "finish": "4:00:00",
+            },
+        )
+
+    def test_one_summary_per_division(self):
+        self.assertEqual(
+            sorted(
+                DivisionSummary.objects.filter(race=self.race).values_list(
+                    "gender", "division", "runners"
+                )
+            ),
+            [("Female", "F35-39", 12), ("Male", "M40-44", 2)],
+        )
@@ -7,5 +7,30 @@ urlpatterns = [
     # map the URL (empty string) to the view
     path(r"", views.ResultsListView.as_view(), name="home"),
     path(r"results", views.ResultsListView.as_view(), name="results_list"),
+    path(
+        r"results.csv",
+        views.ResultsExportView.as_view(export_format="csv"),
+        name="results_csv",
+    ),
+    path(
+        r"results.ndjson",
+        views.ResultsExportView.as_view(export_format="ndjson"),
+        name="results_ndjson",
+    ),
     path(r"result/<int:pk>", views.ResultDetailView.as_view(), name="result_detail"),
+    path(
+        r"result/<int:pk>/passed",
+        views.PassingListView.as_view(direction="passed"),
+        name="result_passed",
+    ),
+    path(
+        r"result/<int:pk>/passed_by",
+        views.PassingListView.as_view(direction="passed_by"),
+        name="result_passed_by",
+    ),
+    path(r"leaderboards", views.LeaderboardView.as_view(), name="leaderboards"),
+    path(r"dashboard", views.DashboardView.as_view(), name="race_dashboard"),
+    path(r"timeline", views.TimelineView.as_view(), name="race_timeline"),
+    path(r"rank", views.RankLookupView.as_view(), name="result_rank"),
+    path(r"predict", views.PredictFinishView.as_view(), name="predict_finish"),
 ]
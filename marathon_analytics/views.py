@@ -1,17 +1,138 @@
 from django.shortcuts import render
 
 from django.db.models.query import QuerySet
-from django.shortcuts import render
-from django.views.generic import ListView, DetailView
-from .models import Result
+from django.shortcuts import get_object_or_404, render
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.generic import ListView, DetailView, TemplateView, View
+from .dashboard import with_template
+from .loader import parse_time
+from .models import (
+    DivisionSummary,
+    Race,
+    RaceDashboard,
+    Result,
+    format_seconds,
+    get_data_version,
+    time_to_seconds,
+)
+from .pagination import KeysetPaginator
+from .predictor import get_predictor
+from .snapshot import get_snapshot
 
+import csv
+import datetime
+import hashlib
+import json
 import plotly
 import plotly.graph_objs as go
 
+# number of runners listed in the "runners like me" panel
+SIMILAR_RUNNERS = 20
+
+# how long the total number of (filtered) results is cached, in seconds
+RESULTS_TOTAL_CACHE_SECONDS = 60 * 60
+
+# Result fields shown as facets beside the results list, with their labels
+FACETS = {
+    "gender": "Gender",
+    "division": "Division",
+    "state": "State",
+    "ctz": "Citizenship",
+}
+
+# most frequent options listed per facet
+FACET_OPTIONS = 20
+
+# request parameters that filter the results list
+FILTER_PARAMS = ["city", "q", *FACETS]
+
+# exported Result fields, with their headers in the results CSV format
+EXPORT_FIELDS = {
+    "bib": "BIB",
+    "first_name": "First Name",
+    "last_name": "Last Name",
+    "ctz": "CTZ",
+    "city": "City",
+    "state": "State",
+    "gender": "Gender",
+    "division": "Division",
+    "place_overall": "Place Overall",
+    "place_gender": "Place Gender",
+    "place_division": "Place Division",
+    "start_time_of_day": "Start TOD",
+    "finish_time_of_day": "Finish TOD",
+    "time_finish": "Finish",
+    "time_half1": "HALF1",
+    "time_half2": "HALF2",
+}
+
+# rows fetched from the database at a time while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _prefix_filter(field, prefix):
+    """
+    Return a Q matching rows whose field starts with prefix, written as a
+    range (field >= prefix and field < the next prefix) so it uses an index.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f"{field}__gte": prefix, f"{field}__lt": upper})
+
+
+def search_filter(q):
+    """
+    Return a Q for a search box query: a number matches the bib exactly,
+    and otherwise the query is a prefix of the last name, first name or
+    city. Several words also match "first last" name prefixes, and the
+    whole phrase is tried as a (multi-word) last name or city prefix.
+    Case-insensitive.
+    """
+    if q.isascii() and q.isdigit():
+        return Q(bib=int(q))
+
+    words = q.lower().split()
+    phrase = " ".join(words)
+    condition = _prefix_filter("last_name_key", phrase) | _prefix_filter(
+        "city_key", phrase
+    )
+    if len(words) > 1:
+        return condition | (
+            _prefix_filter("first_name_key", words[0])
+            & _prefix_filter("last_name_key", " ".join(words[1:]))
+        )
+    return condition | _prefix_filter("first_name_key", phrase)
+
+
+class _RaceMixin:
+    """Select the race a view shows: ?race=<slug>, or the most recent race."""
+
+    def get_race(self):
+        if not hasattr(self, "_race"):
+            slug = self.request.GET.get("race")
+            if slug:
+                self._race = get_object_or_404(Race, slug=slug)
+            else:
+                self._race = Race.get_default()
+        return self._race
+
+    def race_context(self, context):
+        context["race"] = self.get_race()
+        context["races"] = Race.objects.order_by("-year", "name")
+        return context
+
 
 # revise to filter queryset by form field
-class ResultsListView(ListView):
-    """View to display marathon results"""
+class ResultsListView(_RaceMixin, ListView):
+    """
+    View to display one race's marathon results.
+
+    Pages are fetched by keyset (cursor) pagination on (place_overall, id):
+    ?after=<cursor> / ?before=<cursor> seek straight to the page through the
+    index, so deep pages cost the same as the first. An explicit ?page=N
+    still uses Django's OFFSET paginator.
+    """
 
     template_name = "marathon_analytics/results.html"
     model = Result
@@ -20,23 +141,243 @@ class ResultsListView(ListView):
 
     def get_queryset(self):
 
-        # start with entire queryset
-        results = super().get_queryset().order_by("place_overall")
+        # start with this race's entire queryset
+        results = super().get_queryset().order_by("place_overall", "id")
+        results = results.filter(race=self.get_race())
 
+        return self.filter_results(results)
+
+    def filter_results(self, results, skip_facet=None):
+        """
+        Filter results by the request's city, search and facet parameters,
+        ignoring the facet skip_facet.
+        """
         # filter results by these field(s):
         if "city" in self.request.GET:
             city = self.request.GET["city"]
             if city:
                 results = results.filter(city=city)
 
+        q = self.request.GET.get("q", "").strip()
+        if q:
+            results = results.filter(search_filter(q))
+
+        for facet in FACETS:
+            value = self.request.GET.get(facet)
+            if value and facet != skip_facet:
+                results = results.filter(**{facet: value})
+
         return results
 
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate by cursor unless an OFFSET page number was requested."""
+        if "page" in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, ["place_overall", "id"], page_size)
+        self.keyset_page = paginator.page(
+            after=self.request.GET.get("after"),
+            before=self.request.GET.get("before"),
+        )
+        return (None, None, self.keyset_page.object_list, False)
+
+    def get_cache_key(self, name):
+        """
+        Return the cache key for name under the current data version, race
+        and filter parameters.
+        """
+        race = self.get_race()
+        filters = "|".join(
+            self.request.GET.get(param, "").strip() for param in FILTER_PARAMS
+        )
+        return "marathon_analytics:{}:{}:{}:{}".format(
+            name,
+            get_data_version(),
+            race.pk if race else "",
+            hashlib.md5(filters.encode()).hexdigest(),
+        )
+
+    def get_total(self, queryset):
+        """Return the number of results in queryset, cached per data version."""
+        key = self.get_cache_key("results_total")
+        total = cache.get(key)
+        if total is None:
+            total = queryset.count()
+            cache.set(key, total, RESULTS_TOTAL_CACHE_SECONDS)
+        return total
+
+    def get_facet_counts(self):
+        """
+        Return {facet: [(value, count), ...]} with the FACET_OPTIONS most
+        frequent values of every facet. Each facet's counts come from one
+        GROUP BY query under all the other filters, so its options stay
+        selectable while one is chosen. Cached per filter combination and
+        data version.
+        """
+        key = self.get_cache_key("results_facets")
+        counts = cache.get(key)
+        if counts is None:
+            results = Result.objects.filter(race=self.get_race())
+            counts = {}
+            for facet in FACETS:
+                rows = (
+                    self.filter_results(results, skip_facet=facet)
+                    .values_list(facet)
+                    .annotate(count=Count("id"))
+                    .order_by("-count", facet)
+                )
+                counts[facet] = list(rows[:FACET_OPTIONS])
+            cache.set(key, counts, RESULTS_TOTAL_CACHE_SECONDS)
+        return counts
+
+    def get_facets(self, qd):
+        """
+        Return the facets for the template, each with its selected value, a
+        query to clear it and its options with counts and queries selecting
+        them, built from the filter query qd.
+        """
+        facets = []
+        for facet, options in self.get_facet_counts().items():
+            selected = self.request.GET.get(facet, "")
+            choices = []
+            for value, count in options:
+                qd[facet] = value
+                choices.append(
+                    {
+                        "value": value,
+                        "count": count,
+                        "query": qd.urlencode(),
+                        "selected": value == selected,
+                    }
+                )
+            qd.pop(facet, None)
+            facets.append(
+                {
+                    "label": FACETS[facet],
+                    "selected": selected,
+                    "clear_query": qd.urlencode(),
+                    "options": choices,
+                }
+            )
+            if selected:
+                qd[facet] = selected
+        return facets
+
+    def get_context_data(self, **kwargs):
+        """Add cursor links, facets and the cached total to the context."""
+        context = super().get_context_data(**kwargs)
+        self.race_context(context)
+        context["total_results"] = self.get_total(self.object_list)
+
+        # carry the current filters along with the cursor and export links
+        qd = self.request.GET.copy()
+        for param in ("page", "after", "before"):
+            qd.pop(param, None)
+        context["filter_query"] = qd.urlencode()
+        context["facets"] = self.get_facets(qd.copy())
+
+        page = getattr(self, "keyset_page", None)
+        context["keyset_page"] = page
+        if page is not None:
+            if page.has_next():
+                qd["after"] = page.next_cursor
+                context["next_query"] = qd.urlencode()
+                del qd["after"]
+            if page.has_previous():
+                qd["before"] = page.prev_cursor
+                context["prev_query"] = qd.urlencode()
+
+        return context
+
+
+class _Echo:
+    """File-like object whose write() just returns what it was given."""
+
+    def write(self, value):
+        return value
+
+
+class ResultsExportView(ResultsListView):
+    """
+    Stream every result matching the results list filters (race, city,
+    search and facets) as CSV or newline-delimited JSON. Rows are read from
+    the database in chunks and written out as they arrive, so memory use
+    stays flat and the first byte is sent before the query has finished.
+    """
+
+    export_format = "csv"
+
+    def get(self, request, *args, **kwargs):
+        fields = list(EXPORT_FIELDS)
+        rows = (
+            self.get_queryset()
+            .values_list(*fields)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+
+        if self.export_format == "csv":
+            content_type = "text/csv"
+            lines = self.csv_lines(rows)
+        else:
+            content_type = "application/x-ndjson"
+            lines = self.ndjson_lines(fields, rows)
+
+        race = self.get_race()
+        filename = f"{race.slug if race else 'results'}.{self.export_format}"
+        response = StreamingHttpResponse(
+            self.join_lines(lines), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def join_lines(self, lines):
+        """
+        Yield the first line on its own, so the response starts at once, then
+        the remaining lines in blocks of EXPORT_CHUNK_SIZE.
+        """
+        lines = iter(lines)
+        yield next(lines, "")
+
+        block = []
+        for line in lines:
+            block.append(line)
+            if len(block) >= EXPORT_CHUNK_SIZE:
+                yield "".join(block)
+                block = []
+        if block:
+            yield "".join(block)
+
+    def csv_lines(self, rows):
+        """
+        Yield the CSV header, then one CSV line per row, with times written
+        as the results file writes them (H:MM:SS) so the export loads back.
+        """
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_FIELDS.values())
+        for row in rows:
+            yield writer.writerow(
+                [
+                    (
+                        format_seconds(time_to_seconds(value))
+                        if isinstance(value, datetime.time)
+                        else value
+                    )
+                    for value in row
+                ]
+            )
+
+    def ndjson_lines(self, fields, rows):
+        """Yield one JSON object per row, each on its own line."""
+        for row in rows:
+            yield json.dumps(dict(zip(fields, row)), default=str) + "\n"
+
 
 class ResultDetailView(DetailView):
     """View to show detail page for one result."""
 
     template_name = "marathon_analytics/result_detail.html"
     model = Result
+    queryset = Result.objects.select_related("race")
     context_object_name = "r"
 
     def get_context_data(self, **kwargs):
@@ -49,13 +390,7 @@ class ResultDetailView(DetailView):
 
         # create graph of first half/second half as pie chart:
         x = ["first half", "second half"]
-        first_half_seconds = (
-            r.time_half1.hour * 60 + r.time_half1.minute
-        ) * 60 + r.time_half1.second
-        second_half_seconds = (
-            r.time_half2.hour * 60 + r.time_half2.minute
-        ) * 60 + r.time_half2.second
-        y = [first_half_seconds, second_half_seconds]
+        y = [r.half1_seconds, r.half2_seconds]
 
         # generate the Pie chart
         fig = go.Pie(labels=x, values=y)
@@ -88,59 +423,272 @@ class ResultDetailView(DetailView):
         )
         context["graph_div_passed"] = graph_div_passed
 
+        context["similar_runners"] = self.get_similar_runners(r)
 
-class ResultDetailView(DetailView):
-    """View to show detail page for one result."""
+        return context
 
-    template_name = "marathon_analytics/result_detail.html"
-    model = Result
-    context_object_name = "r"
+    def get_similar_runners(self, r):
+        """Return the Results in r's race whose pacing profile is closest to r's."""
+        snapshot = get_snapshot()
+        try:
+            position = snapshot.position(r.pk)
+        except KeyError:
+            # r was loaded after the snapshot was built
+            return []
+
+        ids = [int(i) for i in snapshot.id[snapshot.nearest(position, SIMILAR_RUNNERS)]]
+        results = Result.objects.in_bulk(ids)
+        return [results[i] for i in ids if i in results]
+
+
+class PassingListView(ListView):
+    """
+    View to list, a page at a time, the runners one result passed (or, with
+    direction "passed_by", was passed by). The runners are found in the
+    snapshot's start-sorted race, and only the page shown is read from the
+    database.
+    """
+
+    template_name = "marathon_analytics/passing.html"
+    context_object_name = "results"
+    paginate_by = 50
+    direction = "passed"
+
+    def get_result(self):
+        if not hasattr(self, "_result"):
+            self._result = get_object_or_404(
+                Result.objects.select_related("race"), pk=self.kwargs["pk"]
+            )
+        return self._result
+
+    def get_queryset(self):
+        """Return the ids of the matching runners, in finish order."""
+        snapshot = get_snapshot()
+        try:
+            position = snapshot.position(self.get_result().pk)
+        except KeyError:
+            # the result was loaded after the snapshot was built
+            return []
+
+        passed, passed_by = snapshot.passing(position)
+        positions = passed if self.direction == "passed" else passed_by
+        return snapshot.id[positions].tolist()
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginate the ids, then fetch the Results of this page only."""
+        paginator, page, ids, is_paginated = super().paginate_queryset(
+            queryset, page_size
+        )
+        results = Result.objects.in_bulk(ids)
+        return paginator, page, [results[i] for i in ids if i in results], is_paginated
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["r"] = self.get_result()
+        context["direction"] = self.direction
+        return context
+
+
+class LeaderboardView(_RaceMixin, ListView):
+    """
+    View to show a race's per-division statistics and top finishers, read
+    from the DivisionSummary rows precomputed when the race was loaded.
+    """
+
+    template_name = "marathon_analytics/leaderboards.html"
+    model = DivisionSummary
+    context_object_name = "summaries"
+
+    def get_queryset(self):
+        summaries = super().get_queryset().filter(race=self.get_race())
+
+        gender = self.request.GET.get("gender")
+        if gender:
+            summaries = summaries.filter(gender=gender)
+
+        return summaries
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        self.race_context(context)
+        context["gender"] = self.request.GET.get("gender", "")
+        context["genders"] = (
+            DivisionSummary.objects.filter(race=self.get_race())
+            .order_by("gender")
+            .values_list("gender", flat=True)
+            .distinct()
+        )
+        return context
+
+
+class DashboardView(_RaceMixin, TemplateView):
+    """
+    View to show a race's dashboard: finish times, half splits, the field by
+    gender and division, and starts per minute. The figures are precomputed
+    when the race is loaded, so a page load only reads one row.
+    """
+
+    template_name = "marathon_analytics/dashboard.html"
 
     def get_context_data(self, **kwargs):
         """
         Provide context variables for use in template
         """
-        # start with superclass context
         context = super().get_context_data(**kwargs)
-        r = context["r"]
+        self.race_context(context)
+        dashboard = RaceDashboard.objects.filter(race=self.get_race()).first()
+        if dashboard is None:
+            return context
 
-        # create graph of first half/second half as pie chart:
-        x = ["first half", "second half"]
-        first_half_seconds = (
-            r.time_half1.hour * 60 + r.time_half1.minute
-        ) * 60 + r.time_half1.second
-        second_half_seconds = (
-            r.time_half2.hour * 60 + r.time_half2.minute
-        ) * 60 + r.time_half2.second
-        y = [first_half_seconds, second_half_seconds]
+        # include plotly.js with the first chart only; the stored figures were
+        # validated when they were built, and are stored without the template
+        for i, (name, figure) in enumerate(dashboard.figures.items()):
+            context[f"graph_div_{name}"] = plotly.offline.plot(
+                with_template(figure),
+                auto_open=False,
+                output_type="div",
+                include_plotlyjs=i == 0,
+                validate=False,
+            )
+        context["dashboard"] = dashboard
 
-        # generate the Pie chart
-        fig = go.Pie(labels=x, values=y)
-        title_text = f"Half Marathon Splits"
-        # obtain the graph as an HTML div"
-        graph_div_splits = plotly.offline.plot(
+        return context
+
+
+class RankLookupView(_RaceMixin, View):
+    """
+    JSON endpoint reporting the overall, gender and division rank and
+    percentile that a finish time would earn in a race, e.g.
+    rank?time=3:45:00&gender=Female&division=30-34&race=chicago-2023
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            t = parse_time(request.GET.get("time", ""))
+        except ValueError:
+            return JsonResponse({"error": "time must be given as H:MM:SS"}, status=400)
+        seconds = time_to_seconds(t)
+
+        gender = request.GET.get("gender") or None
+        division = request.GET.get("division") or None
+
+        try:
+            race = self.get_race()
+        except Http404:
+            return JsonResponse({"error": "no such race"}, status=404)
+        if race is None:
+            return JsonResponse({"error": "no results loaded"}, status=404)
+
+        cohorts = {"overall": {}}
+        if gender:
+            cohorts["gender"] = {"gender": gender}
+        if division:
+            cohorts["division"] = {"gender": gender, "division": division}
+
+        snapshot = get_snapshot()
+        data = {"race": race.slug, "time": t.strftime("%H:%M:%S"), "seconds": seconds}
+        for cohort, filters in cohorts.items():
+            rank, percentile, field_size = snapshot.rank(
+                "finish", seconds, race.pk, **filters
+            )
+            data[cohort] = {
+                "rank": rank,
+                "percentile": percentile,
+                "field_size": field_size,
+            }
+
+        return JsonResponse(data)
+
+
+class PredictFinishView(_RaceMixin, View):
+    """
+    JSON endpoint predicting a finish time in a race, with a 90% prediction
+    interval, from a first-half split, e.g.
+    predict?half1=1:50:00&gender=Female&division=30-34&race=chicago-2023
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            half1 = time_to_seconds(parse_time(request.GET.get("half1", "")))
+        except ValueError:
+            half1 = 0
+        if half1 <= 0:
+            return JsonResponse({"error": "half1 must be given as H:MM:SS"}, status=400)
+
+        gender = request.GET.get("gender") or None
+        division = request.GET.get("division") or None
+
+        try:
+            race = self.get_race()
+        except Http404:
+            return JsonResponse({"error": "no such race"}, status=404)
+        predictor = get_predictor()
+        bounds = race and predictor.half1_range(race.pk)
+        if not bounds:
+            return JsonResponse({"error": "no results loaded"}, status=404)
+
+        # only predict within the first halves the race's fit has seen
+        shortest, longest = bounds
+        if not shortest <= half1 <= longest:
+            return JsonResponse(
+                {
+                    "error": f"half1 must be between {format_seconds(shortest)} "
+                    f"and {format_seconds(longest)} in this race"
+                },
+                status=400,
+            )
+
+        cohort, finish, low, high = predictor.predict(half1, race.pk, gender, division)
+        return JsonResponse(
             {
-                "data": [fig],
-                "layout_title_text": title_text,
-            },
-            auto_open=False,
-            output_type="div",
+                "race": race.slug,
+                "half1": format_seconds(half1),
+                "cohort": cohort,
+                "finish": format_seconds(finish),
+                "finish_seconds": round(finish),
+                "low": format_seconds(low),
+                "high": format_seconds(high),
+            }
         )
-        # send div as template context variable
-        context["graph_div_splits"] = graph_div_splits
 
-        # create graph of runners who passed/passed by
-        x = [f"Runners Passed by {r.first_name}", f"Runners who Passed {r.first_name}"]
-        y = [r.get_runners_passed(), r.get_runners_passed_by()]
 
-        fig = go.Bar(x=x, y=y)
-        title_text = f"Runners Passed/Passed By"
-        graph_div_passed = plotly.offline.plot(
+class TimelineView(_RaceMixin, TemplateView):
+    """View to show how many runners were on a race's course at each minute."""
+
+    template_name = "marathon_analytics/timeline.html"
+
+    def get_context_data(self, **kwargs):
+        """
+        Provide context variables for use in template
+        """
+        context = super().get_context_data(**kwargs)
+        self.race_context(context)
+        race = self.get_race()
+        if race is None:
+            return context
+
+        # the series are precomputed once per data load by the snapshot
+        minutes, not_started, on_course, finished = get_snapshot().timeline(race.pk)
+        x = [f"{m // 60:02d}:{m % 60:02d}" for m in minutes.tolist()]
+
+        data = [
+            go.Scatter(x=x, y=not_started, name="Not Started", stackgroup="runners"),
+            go.Scatter(x=x, y=on_course, name="On Course", stackgroup="runners"),
+            go.Scatter(x=x, y=finished, name="Finished", stackgroup="runners"),
+        ]
+        title_text = "Runners on the Course"
+        context["graph_div_timeline"] = plotly.offline.plot(
             {
-                "data": [fig],
+                "data": data,
                 "layout_title_text": title_text,
             },
             auto_open=False,
             output_type="div",
         )
-        context["graph_div_passed"] = graph_div_passed
+
+        if len(minutes):
+            busiest = int(on_course.argmax())
+            context["peak_time"] = x[busiest]
+            context["peak_on_course"] = int(on_course[busiest])
+
+        return context
@@ -0,0 +1,150 @@
+# File: voter_analytics/bitmaps.py
+# Author: Louise Lee, llouise@bu.edu, 10/18/2026
+# Description: Optional in-memory bitmap index answering the voter filters with
+# NumPy boolean arrays instead of SQL queries
+
+import threading
+
+from django.conf import settings
+
+from .models import VERSION_CHECK_INTERVAL, Voter, get_data_version
+
+try:
+    import numpy as np
+except ImportError:  # the index is optional; views fall back to SQL
+    np = None
+
+# Election participation fields indexed as bitmaps
+ELECTION_FIELDS = ["v20state", "v21town", "v21primary", "v22general", "v23town"]
+
+
+class VoterBitmapIndex:
+    """
+    Bitmaps over every Voter, in voter list order (last name, first name,
+    id): one NumPy boolean array per party, per voter score and per election
+    flag, plus the birth year of each voter (0 if unknown) for year ranges.
+    A filter combination is the AND of its bitmaps, so counts and id lists
+    come from a few vectorized operations instead of a table scan.
+    """
+
+    def __init__(self, version, ids, parties, party_codes, years, scores, elections):
+        self.version = version
+        self.ids = ids
+        self.parties = parties
+        self.party_codes = party_codes
+        self.years = years
+        self.has_year = years > 0
+        self.party_bitmaps = {
+            party: party_codes == i for i, party in enumerate(parties)
+        }
+        self.score_bitmaps = {score: scores == score for score in np.unique(scores)}
+        self.election_bitmaps = elections
+
+    @classmethod
+    def build(cls, version):
+        """Read the filter columns of every Voter once and index them."""
+        rows = list(
+            Voter.objects.order_by("last_name", "first_name", "id").values_list(
+                "id", "party_affiliation", "birth_year", "voter_score", *ELECTION_FIELDS
+            )
+        )
+        columns = list(zip(*rows)) or [()] * (4 + len(ELECTION_FIELDS))
+
+        parties, party_codes = np.unique(
+            np.array([p or "" for p in columns[1]], dtype=str), return_inverse=True
+        )
+        years = np.array([y or 0 for y in columns[2]], dtype=np.int16)
+        elections = {
+            field: np.array(values, dtype=bool)
+            for field, values in zip(ELECTION_FIELDS, columns[4:])
+        }
+        return cls(
+            version,
+            np.array(columns[0], dtype=np.int64),
+            parties,
+            party_codes.ravel(),
+            years,
+            np.array(columns[3], dtype=np.int64),
+            elections,
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    def select(
+        self, party=None, min_year=None, max_year=None, score=None, elections=()
+    ):
+        """
+        Return the boolean array of voters matching every given filter (None
+        or empty means no restriction), like _FilterMixin._filtered_queryset.
+        """
+        selected = np.ones(len(self), dtype=bool)
+        if party is not None:
+            selected &= self.party_bitmaps.get(party, False)
+        if min_year is not None:
+            selected &= self.has_year & (self.years >= min_year)
+        if max_year is not None:
+            selected &= self.has_year & (self.years <= max_year)
+        if score is not None:
+            selected &= self.score_bitmaps.get(score, False)
+        for field in elections:
+            selected &= self.election_bitmaps[field]
+        return selected
+
+    def count(self, selected):
+        """Return the number of voters selected."""
+        return int(np.count_nonzero(selected))
+
+    def select_ids(self, selected):
+        """
+        Return the ids of the voters selected, in voter list order, as a
+        NumPy array: it can be paginated as it is, converting only the ids
+        of the page shown.
+        """
+        return self.ids[selected]
+
+    def year_counts(self, selected):
+        """Return [(birth year, count)] of the voters selected, by year."""
+        years = self.years[selected & self.has_year]
+        if not len(years):
+            return []
+        counts = np.bincount(years)
+        return [(int(y), int(counts[y])) for y in np.flatnonzero(counts)]
+
+    def party_counts(self, selected):
+        """Return [(party, count)] of the voters selected, by party."""
+        counts = np.bincount(self.party_codes[selected], minlength=len(self.parties))
+        return [(str(p), int(n)) for p, n in zip(self.parties, counts) if n]
+
+    def election_counts(self, selected):
+        """Return {election field: number of the voters selected who voted}."""
+        return {
+            field: int(np.count_nonzero(selected & bitmap))
+            for field, bitmap in self.election_bitmaps.items()
+        }
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_bitmap_index():
+    """
+    Return the process-wide VoterBitmapIndex, building it on first use and
+    again whenever the data version changes, or None if the index is
+    disabled (VOTER_BITMAP_INDEX = False in the settings) or NumPy is not
+    installed.
+    """
+    global _index
+
+    if np is None or not getattr(settings, "VOTER_BITMAP_INDEX", True):
+        return None
+
+    version = get_data_version(VERSION_CHECK_INTERVAL)
+    if _index is not None and _index.version == version:
+        return _index
+
+    with _lock:
+        if _index is None or _index.version != version:
+            _index = VoterBitmapIndex.build(version)
+        return _index
@@ -0,0 +1,161 @@
+# File: voter_analytics/loader.py
+# Author: Louise Lee, llouise@bu.edu, 10/18/2026
+# Description: Bulk loading of the voter CSV file into the Voter table
+
+import csv
+import io
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from .models import Voter, bump_data_version, rebuild_voter_cube
+from .parsing import VOTER_FIELDS, parse_chunk
+
+# default location of the voter file
+VOTERS_FILENAME = Path(__file__).resolve().parent / "data" / "newton_voters.csv"
+
+# number of Voter rows sent to the database per executemany()
+BATCH_SIZE = 5000
+
+# approximate size of the pieces of the file parsed by each worker task
+CHUNK_BYTES = 4 * 1024 * 1024
+
+
+class LoadStats:
+    """Summary of one voter file load: rows created, rows skipped and why, timing."""
+
+    def __init__(self):
+        self.loaded = 0
+        self.skipped = 0
+        self.skip_reasons = Counter()
+        self.first_skipped_lines = []
+        self.elapsed = 0.0
+
+    def skip(self, line_num, reason):
+        """Record that the row on line_num was skipped for reason."""
+        self.skipped += 1
+        self.skip_reasons[reason] += 1
+        if len(self.first_skipped_lines) < 10:
+            self.first_skipped_lines.append(line_num)
+
+    @property
+    def rows_per_second(self):
+        """Return the number of rows read per second of wall-clock time."""
+        if self.elapsed <= 0:
+            return 0.0
+        return (self.loaded + self.skipped) / self.elapsed
+
+    def __str__(self):
+        return "Loaded {} voters, skipped {} in {:.2f}s ({:.0f} rows/sec).".format(
+            self.loaded, self.skipped, self.elapsed, self.rows_per_second
+        )
+
+
+def split_file(path, chunks):
+    """
+    Return (header, ranges): the column names of the voter file at path and
+    up to chunks (start, end) byte ranges covering its data rows, each range
+    starting and ending on a line boundary. (Fields holding line breaks
+    would be split; the voter file has none.)
+    """
+    with open(path, "rb") as f:
+        header_line = f.readline().decode("utf-8-sig")
+        header = [name.strip() for name in next(csv.reader([header_line]), [])]
+        start = f.tell()
+        size = f.seek(0, io.SEEK_END)
+
+        bounds = [start]
+        for i in range(1, chunks):
+            # move to the start of the line following the split point
+            f.seek(start + (size - start) * i // chunks - 1)
+            f.readline()
+            if bounds[-1] < f.tell() < size:
+                bounds.append(f.tell())
+        bounds.append(size)
+
+    return header, [r for r in zip(bounds, bounds[1:]) if r[0] < r[1]]
+
+
+def parse_file(path, workers):
+    """
+    Yield parse_chunk() results for consecutive pieces of the voter file at
+    path, in file order. The pieces are parsed by a pool of workers
+    processes, keeping at most two per worker in flight so the parsed rows
+    never pile up ahead of the writer; with one worker (or a small file) they
+    are parsed in this process.
+    """
+    chunks = max(workers, os.path.getsize(path) // CHUNK_BYTES)
+    header, ranges = split_file(path, chunks)
+
+    if workers <= 1 or len(ranges) <= 1:
+        for start, end in ranges:
+            yield parse_chunk(str(path), start, end, header)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(parse_chunk, str(path), start, end, header))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def insert_rows(rows):
+    """
+    INSERT parsed voter rows (VOTER_FIELDS values) with a single
+    executemany(). bulk_create() is held to SQLite's 999 query parameters,
+    about 50 voters per statement, so a large file would compile thousands
+    of INSERT statements.
+    """
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        connection.ops.quote_name(Voter._meta.db_table),
+        ", ".join(
+            connection.ops.quote_name(Voter._meta.get_field(name).column)
+            for name in VOTER_FIELDS
+        ),
+        ", ".join(["%s"] * len(VOTER_FIELDS)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def load_voters(csv_path=None, batch_size=BATCH_SIZE, workers=None):
+    """
+    Replace every Voter with the rows of the voter CSV file at csv_path.
+
+    The file is split into byte ranges on line boundaries, parsed by a pool
+    of workers processes (one per CPU by default), and the parsed rows are
+    inserted in file order by this process in batches of batch_size, all
+    inside one transaction: either the whole file is loaded or the table is
+    left as it was. The count cube is rebuilt and the data version bumped
+    before the transaction commits. Returns a LoadStats.
+    """
+    csv_path = Path(csv_path) if csv_path else VOTERS_FILENAME
+    workers = workers or os.cpu_count() or 1
+    stats = LoadStats()
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        # Remove existing rows so re-load is idempotent
+        Voter.objects.all().delete()
+
+        line_num = 2
+        for rows, skips, lines in parse_file(csv_path, workers):
+            for offset, reason in skips:
+                stats.skip(line_num + offset, reason)
+            for i in range(0, len(rows), batch_size):
+                insert_rows(rows[i : i + batch_size])
+            stats.loaded += len(rows)
+            line_num += lines
+
+        rebuild_voter_cube()
+        bump_data_version()
+
+    stats.elapsed = time.perf_counter() - started
+    return stats
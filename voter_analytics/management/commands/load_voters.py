@@ -0,0 +1,41 @@
+# File: voter_analytics/management/commands/load_voters.py
+# Author: Louise Lee, llouise@bu.edu, 10/18/2026
+# Description: Management command to bulk load the voter CSV file
+
+from django.core.management.base import BaseCommand
+
+from voter_analytics.loader import BATCH_SIZE, VOTERS_FILENAME, load_voters
+
+
+class Command(BaseCommand):
+    """Load the voter file into the Voter table."""
+
+    help = "Replace every Voter with the rows of a voter CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_path", nargs="?", default=VOTERS_FILENAME)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="processes parsing the file (default: one per CPU)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="rows per batch of INSERTs (default {})".format(BATCH_SIZE),
+        )
+
+    def handle(self, *args, **options):
+        stats = load_voters(
+            options["csv_path"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+        )
+
+        self.stdout.write(self.style.SUCCESS(str(stats)))
+        for reason, count in stats.skip_reasons.most_common():
+            self.stdout.write("  skipped {} rows: {}".format(count, reason))
+        if stats.first_skipped_lines:
+            lines = ", ".join(str(n) for n in stats.first_skipped_lines)
+            self.stdout.write("  first skipped lines: {}".format(lines))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("voter_analytics", "0009_dataversion"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VoterCube",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "party_affiliation",
+                    models.CharField(blank=True, max_length=2, null=True),
+                ),
+                ("birth_year", models.IntegerField(blank=True, null=True)),
+                ("voter_score", models.IntegerField(default=0)),
+                ("v20state", models.BooleanField(default=False)),
+                ("v21town", models.BooleanField(default=False)),
+                ("v21primary", models.BooleanField(default=False)),
+                ("v22general", models.BooleanField(default=False)),
+                ("v23town", models.BooleanField(default=False)),
+                ("voters", models.IntegerField()),
+            ],
+        ),
+    ]
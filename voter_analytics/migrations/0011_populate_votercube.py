@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+
+def populate_voter_cube(apps, schema_editor):
+    """Build the count cube from the Voters already loaded."""
+    Voter = apps.get_model("voter_analytics", "Voter")
+    VoterCube = apps.get_model("voter_analytics", "VoterCube")
+    rows = (
+        Voter.objects.values(
+            "party_affiliation",
+            "voter_score",
+            "v20state",
+            "v21town",
+            "v21primary",
+            "v22general",
+            "v23town",
+            birth_year=ExtractYear("date_of_birth"),
+        )
+        .annotate(voters=Count("id"))
+        .order_by()
+    )
+    VoterCube.objects.bulk_create(
+        [VoterCube(**row) for row in rows.iterator()], batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("voter_analytics", "0010_votercube"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_voter_cube, migrations.RunPython.noop),
+    ]
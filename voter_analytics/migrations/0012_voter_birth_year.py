@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("voter_analytics", "0011_populate_votercube"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="voter",
+            name="birth_year",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="voter",
+            index=models.Index(
+                fields=["last_name", "first_name"],
+                name="voter_analy_last_na_81258d_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="voter",
+            index=models.Index(
+                fields=["party_affiliation", "voter_score", "birth_year"],
+                name="voter_analy_party_a_8da5ca_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="voter",
+            index=models.Index(
+                fields=["party_affiliation", "birth_year"],
+                name="voter_analy_party_a_443db6_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="voter",
+            index=models.Index(
+                fields=["voter_score", "birth_year"],
+                name="voter_analy_voter_s_b7ac2f_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="voter",
+            index=models.Index(
+                fields=["birth_year"], name="voter_analy_birth_y_64fe97_idx"
+            ),
+        ),
+    ]
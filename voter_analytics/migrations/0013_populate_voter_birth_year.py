@@ -0,0 +1,19 @@
+from django.db import migrations
+from django.db.models.functions import ExtractYear
+
+
+def populate_birth_year(apps, schema_editor):
+    """Fill the stored birth year of existing Voters from their date of birth."""
+    Voter = apps.get_model("voter_analytics", "Voter")
+    Voter.objects.update(birth_year=ExtractYear("date_of_birth"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("voter_analytics", "0012_voter_birth_year"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_birth_year, migrations.RunPython.noop),
+    ]
@@ -3,9 +3,8 @@
 # Description: Models define the fields (columns) of database, specifying data types, values, rules
 
 from django.db import models
-from pathlib import Path
-from datetime import datetime
-import csv
+
+import time
 
 
 class Voter(models.Model):
@@ -23,6 +22,8 @@ class Voter(models.Model):
 
     # Voter information
     date_of_birth = models.DateField(null=True, blank=True)
+    # year of date_of_birth, stored so year filters can use an index
+    birth_year = models.IntegerField(null=True, blank=True)
     date_of_registration = models.DateField(null=True, blank=True)
     party_affiliation = models.CharField(max_length=2, blank=True, null=True)
     precinct_number = models.TextField(blank=True, null=True)
@@ -35,6 +36,18 @@ class Voter(models.Model):
     v23town = models.BooleanField(default=False)
     voter_score = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # list pages are ordered by name
+            models.Index(fields=["last_name", "first_name"]),
+            # filter combinations: party alone, party + score and/or birth
+            # year, score + birth year, and birth year alone
+            models.Index(fields=["party_affiliation", "voter_score", "birth_year"]),
+            models.Index(fields=["party_affiliation", "birth_year"]),
+            models.Index(fields=["voter_score", "birth_year"]),
+            models.Index(fields=["birth_year"]),
+        ]
+
     # Admin comment
     def __str__(self):
         return "{} {} - {} {}, Precinct {}".format(
@@ -45,96 +58,115 @@ class Voter(models.Model):
             self.precinct_number or "",
         )
 
+    def save(self, *args, **kwargs):
+        # Keep the stored birth year in step with the date of birth
+        self.birth_year = self.date_of_birth.year if self.date_of_birth else None
+        super().save(*args, **kwargs)
 
-# Helper
-def _parse_date(s):
-    s = (s or "").strip()
-    if not s:
-        return None
-    for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
-        try:
-            return datetime.strptime(s, fmt).date()
-        except ValueError:
-            pass
-    return None
 
+class VoterCube(models.Model):
+    """
+    Pre-aggregated voter counts: one row per distinct combination of the
+    filter and graph attributes, with the number of voters sharing it.
+    Rebuilt by rebuild_voter_cube() whenever the voter data is loaded.
+    """
 
-def _parse_bool(s):
-    return (s or "").strip().upper() in ("TRUE", "T", "YES", "Y", "1")
+    party_affiliation = models.CharField(max_length=2, blank=True, null=True)
+    birth_year = models.IntegerField(null=True, blank=True)
+    voter_score = models.IntegerField(default=0)
+    v20state = models.BooleanField(default=False)
+    v21town = models.BooleanField(default=False)
+    v21primary = models.BooleanField(default=False)
+    v22general = models.BooleanField(default=False)
+    v23town = models.BooleanField(default=False)
 
+    voters = models.IntegerField()
 
-def _party_two_chars(s):
-    # Normalize to 2-char field (strip then pad to 2 chars)
-    s = (s or "").strip().upper()[:2]
-    return s.ljust(2)
+    def __str__(self):
+        return "{} born {}, score {}: {} voters".format(
+            self.party_affiliation, self.birth_year, self.voter_score, self.voters
+        )
 
 
-# Load data
-def load_data(csv_path=None):
-    """Clear and load voter records from CSV into the database."""
-    # Remove existing rows so re-load is idempotent
-    Voter.objects.all().delete()
+def rebuild_voter_cube():
+    """
+    Replace the VoterCube rows with one GROUP BY over the Voter table.
+    Returns the number of cube rows.
+    """
+    rows = (
+        Voter.objects.values(
+            "party_affiliation",
+            "voter_score",
+            "v20state",
+            "v21town",
+            "v21primary",
+            "v22general",
+            "v23town",
+            "birth_year",
+        )
+        .annotate(voters=models.Count("id"))
+        .order_by()
+    )
+    cells = [VoterCube(**row) for row in rows]
 
-    if csv_path is None:
-        # Default CSV path
-        csv_path = Path(__file__).resolve().parent / "data" / "newton_voters.csv"
-    else:
-        csv_path = Path(csv_path)
+    VoterCube.objects.all().delete()
+    VoterCube.objects.bulk_create(cells, batch_size=2000)
+    return len(cells)
 
-    loaded_count = 0
-    skipped_count = 0
 
-    with csv_path.open(newline="", encoding="utf-8") as f:
-        # Use DictReader to handle headers automatically
-        reader = csv.DictReader(f)
+class DataVersion(models.Model):
+    """
+    A single-row counter bumped every time the voter data is reloaded, so
+    data cached from the Voter table knows when it is stale.
+    """
 
-        # Debug: print field names
-        print("CSV Fields: {}".format(reader.fieldnames))
+    version = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
 
-        # Clean up field names (strip spaces)
-        reader.fieldnames = [
-            (field.strip() if field else field) for field in reader.fieldnames
-        ]
-        print("Cleaned Fields: {}".format(reader.fieldnames))
-
-        for line_num, row in enumerate(reader, start=2):
-            try:
-                voter = Voter(
-                    last_name=(row.get("Last Name") or "").strip(),
-                    first_name=(row.get("First Name") or "").strip(),
-                    street_number=(
-                        row.get("Residential Address - Street Number") or ""
-                    ).strip(),
-                    street_name=(
-                        row.get("Residential Address - Street Name") or ""
-                    ).strip(),
-                    apartment_number=(
-                        (
-                            row.get("Residential Address - Apartment Number") or ""
-                        ).strip()
-                        or None
-                    ),
-                    zip_code=(row.get("Residential Address - Zip Code") or "").strip(),
-                    date_of_birth=_parse_date(row.get("Date of Birth") or ""),
-                    date_of_registration=_parse_date(
-                        row.get("Date of Registration") or ""
-                    ),
-                    party_affiliation=_party_two_chars(
-                        row.get("Party Affiliation") or ""
-                    ),
-                    precinct_number=(row.get("Precinct Number") or "").strip(),
-                    v20state=_parse_bool(row.get("v20state") or ""),
-                    v21town=_parse_bool(row.get("v21town") or ""),
-                    v21primary=_parse_bool(row.get("v21primary") or ""),
-                    v22general=_parse_bool(row.get("v22general") or ""),
-                    v23town=_parse_bool(row.get("v23town") or ""),
-                    voter_score=int(((row.get("voter_score") or "0").strip() or "0")),
-                )
-                voter.save()
-                loaded_count += 1
-
-            except Exception as e:
-                skipped_count += 1
-                print("Skipped row due to error: {} Row: {}".format(e, row))
-
-    print("Loaded {} voters ({} skipped).".format(Voter.objects.count(), skipped_count))
+    def __str__(self):
+        return "Voter data version {} ({})".format(self.version, self.updated)
+
+
+# Seconds a process reuses its last read of the data version in views
+VERSION_CHECK_INTERVAL = 5
+
+# this process's last read of the data version, and when it was made
+_version_read = (0, None)
+
+
+def get_data_version(max_age=0):
+    """
+    Return the current version of the voter data (0 if never loaded). A
+    version this process read less than max_age seconds ago is returned
+    without querying the database.
+    """
+    global _version_read
+
+    read_at, version = _version_read
+    now = time.monotonic()
+    if version is None or now - read_at >= max_age:
+        version = DataVersion.objects.filter(pk=1).values_list("version", flat=True)
+        version = version.first() or 0
+        _version_read = (now, version)
+    return version
+
+
+def bump_data_version():
+    """Record that the voter data has changed; return the new version."""
+    global _version_read
+
+    data_version, _ = DataVersion.objects.get_or_create(pk=1)
+    data_version.version += 1
+    data_version.save()
+    _version_read = (time.monotonic(), data_version.version)
+    return data_version.version
+
+
+# Load data
+def load_data(csv_path=None):
+    """Clear and load voter records from CSV into the database."""
+    from .loader import load_voters
+
+    stats = load_voters(csv_path)
+    print(stats)
+    return stats
@@ -0,0 +1,135 @@
+# File: voter_analytics/parsing.py
+# Author: Louise Lee, llouise@bu.edu, 10/18/2026
+# Description: Parsing of voter file rows into Voter column values. Kept free of
+# Django so that worker processes can import it without configuring settings.
+
+import csv
+import io
+from datetime import datetime
+from functools import lru_cache
+
+# Voter fields, in the order parse_row() returns their values
+VOTER_FIELDS = [
+    "last_name",
+    "first_name",
+    "street_number",
+    "street_name",
+    "apartment_number",
+    "zip_code",
+    "date_of_birth",
+    "birth_year",
+    "date_of_registration",
+    "party_affiliation",
+    "precinct_number",
+    "v20state",
+    "v21town",
+    "v21primary",
+    "v22general",
+    "v23town",
+    "voter_score",
+]
+
+
+# Helper
+def _parse_date(s):
+    s = (s or "").strip()
+    if not s:
+        return None
+    for fmt in ("%m/%d/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(s, fmt).date()
+        except ValueError:
+            pass
+    return None
+
+
+@lru_cache(maxsize=1 << 16)
+def _date_value(s):
+    """
+    Return the stored (ISO) form of a date from the file, or None. Memoized:
+    birth and registration dates repeat often and strptime() is slow.
+    """
+    date = _parse_date(s)
+    return date.isoformat() if date else None
+
+
+def _parse_bool(s):
+    return (s or "").strip().upper() in ("TRUE", "T", "YES", "Y", "1")
+
+
+def _party_two_chars(s):
+    # Normalize to 2-char field (strip then pad to 2 chars)
+    s = (s or "").strip().upper()[:2]
+    return s.ljust(2)
+
+
+def parse_row(fields, index):
+    """
+    Return the values of VOTER_FIELDS for one row of the file, given the
+    position of each column name in index.
+    """
+
+    def text(column):
+        i = index.get(column)
+        return fields[i].strip() if i is not None else ""
+
+    date_of_birth = _date_value(text("Date of Birth"))
+    return (
+        text("Last Name"),
+        text("First Name"),
+        text("Residential Address - Street Number"),
+        text("Residential Address - Street Name"),
+        text("Residential Address - Apartment Number") or None,
+        text("Residential Address - Zip Code"),
+        date_of_birth,
+        int(date_of_birth[:4]) if date_of_birth else None,
+        _date_value(text("Date of Registration")),
+        _party_two_chars(text("Party Affiliation")),
+        text("Precinct Number"),
+        _parse_bool(text("v20state")),
+        _parse_bool(text("v21town")),
+        _parse_bool(text("v21primary")),
+        _parse_bool(text("v22general")),
+        _parse_bool(text("v23town")),
+        int(text("voter_score") or "0"),
+    )
+
+
+def skip_reason(error):
+    """Collapse an exception into a short reason used to group skipped rows."""
+    message = str(error)
+    if message.startswith("expected"):
+        return "wrong number of fields"
+    if "invalid literal for int()" in message:
+        return "invalid number"
+    return type(error).__name__
+
+
+def parse_chunk(path, start, end, header):
+    """
+    Parse the rows between byte offsets start and end of the voter file at
+    path (both on line boundaries) and return (rows, skips, lines): the
+    parse_row() values of the good rows, (line offset, reason) for the rows
+    skipped, and the number of lines read.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    index = {name: i for i, name in enumerate(header)}
+    rows = []
+    skips = []
+    lines = 0
+    for lines, fields in enumerate(csv.reader(io.StringIO(text, newline="")), 1):
+        if not fields:
+            continue
+        try:
+            if len(fields) != len(header):
+                raise ValueError(
+                    "expected {} fields, got {}".format(len(header), len(fields))
+                )
+            rows.append(parse_row(fields, index))
+        except (ValueError, TypeError) as e:
+            skips.append((lines - 1, skip_reason(e)))
+
+    return rows, skips, lines
@@ -1,3 +1,338 @@
-from django.test import TestCase
+# File: voter_analytics/tests.py
+# Author: Louise Lee, llouise@bu.edu, 10/18/2026
+# Description: Checks that the filtered voter queries are answered from indexes
 
-# Create your tests here.
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import RequestFactory, TestCase, override_settings
+
+from . import bitmaps
+from .bitmaps import VoterBitmapIndex, np
+from .loader import load_voters, split_file
+from .models import Voter, VoterCube, get_data_version
+from .parsing import VOTER_FIELDS
+from .views import ELECTIONS, GraphsView, VoterListView
+
+HEADER = (
+    "Voter ID Number,Last Name,First Name,Residential Address - Street Number,"
+    "Residential Address - Street Name,Residential Address - Apartment Number,"
+    "Residential Address - Zip Code,Date of Birth,Date of Registration,"
+    "Party Affiliation,Precinct Number,v20state,v21town,v21primary,v22general,"
+    "v23town,voter_score"
+)
+
+PARTIES = ["D ", "R ", "U ", "L ", "CC"]
+
+
+def voter_line(i):
+    """Return one line of a voter file, varied by i."""
+    flags = ["TRUE" if (i >> bit) & 1 else "FALSE" for bit in range(5)]
+    return ",".join(
+        [
+            "{:08d}".format(i),
+            "Last{}".format(i % 37),
+            "First{}".format(i),
+            str(i % 300),
+            "Main St",
+            str(i % 4) if i % 3 else "",
+            "02459",
+            "{}-{:02d}-{:02d}".format(1930 + i % 40, i % 12 + 1, i % 28 + 1),
+            "2001-01-15",
+            PARTIES[i % len(PARTIES)],
+            "{}A".format(i % 9),
+            *flags,
+            str(sum(flag == "TRUE" for flag in flags)),
+        ]
+    )
+
+
+def write_voter_file(test_case, lines):
+    """Write a voter file of lines for test_case and return its name."""
+    fd, filename = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write("\n".join([HEADER, *lines]) + "\n")
+    test_case.addCleanup(os.remove, filename)
+    return filename
+
+
+def voter_file_lines(n):
+    """
+    Return n lines of a voter file with three bad rows: missing fields on
+    line 39, a bad score on line 152 and an extra field on the last line.
+    """
+    lines = [voter_line(i) for i in range(n)]
+    lines[37] = lines[37].rsplit(",", 3)[0]
+    lines[150] = lines[150].rsplit(",", 1)[0] + ",x"
+    lines[-1] += ",extra"
+    return lines
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite's")
+class FilterQueryPlanTests(TestCase):
+    """EXPLAIN QUERY PLAN of the voter list's filter combinations."""
+
+    def plan(self, query):
+        view = VoterListView()
+        view.request = RequestFactory().get("/voters", query)
+        return (
+            view._filtered_queryset()
+            .order_by("last_name", "first_name", "id")
+            .explain()
+        )
+
+    def assertSearchesIndex(self, query, index_fields):
+        plan = self.plan(query)
+        self.assertNotIn("SCAN voter_analytics_voter", plan)
+        self.assertIn("SEARCH voter_analytics_voter USING INDEX", plan)
+        self.assertIn("({})".format(index_fields), plan)
+
+    def test_party(self):
+        self.assertSearchesIndex({"party_affiliation": "D"}, "party_affiliation=?")
+
+    def test_party_and_score(self):
+        self.assertSearchesIndex(
+            {"party_affiliation": "D", "voter_score": "2"},
+            "party_affiliation=? AND voter_score=?",
+        )
+
+    def test_party_and_birth_years(self):
+        self.assertSearchesIndex(
+            {
+                "party_affiliation": "R",
+                "min_birth_year": "1950",
+                "max_birth_year": "1960",
+            },
+            "party_affiliation=? AND birth_year>? AND birth_year<?",
+        )
+
+    def test_party_score_and_birth_year(self):
+        self.assertSearchesIndex(
+            {"party_affiliation": "U", "voter_score": "4", "min_birth_year": "1980"},
+            "party_affiliation=? AND voter_score=? AND birth_year>?",
+        )
+
+    def test_score_and_birth_year(self):
+        self.assertSearchesIndex(
+            {"voter_score": "3", "max_birth_year": "1970"},
+            "voter_score=? AND birth_year<?",
+        )
+
+    def test_birth_years(self):
+        self.assertSearchesIndex(
+            {"min_birth_year": "1950", "max_birth_year": "1955"},
+            "birth_year>? AND birth_year<?",
+        )
+
+    def test_party_and_election(self):
+        self.assertSearchesIndex(
+            {"party_affiliation": "D", "v22general": "on"}, "party_affiliation=?"
+        )
+
+    def test_unfiltered_list_uses_name_index(self):
+        plan = self.plan({})
+        self.assertIn("USING INDEX voter_analy_last_na_81258d_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+
+class VoterFileTests(TestCase):
+    """Splitting and parsing the voter file in pieces and in parallel."""
+
+    def test_split_file_ranges(self):
+        filename = write_voter_file(self, voter_file_lines(400))
+        with open(filename, "rb") as f:
+            data = f.read()
+        for chunks in (1, 2, 7, 50):
+            header, ranges = split_file(filename, chunks)
+            self.assertEqual(header, HEADER.split(","))
+            self.assertLessEqual(len(ranges), chunks)
+            self.assertEqual(ranges[0][0], len(HEADER) + 1)
+            self.assertEqual(ranges[-1][1], len(data))
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+                self.assertEqual(data[start - 1 : start], b"\n")
+
+    def load(self, filename, workers):
+        stats = load_voters(filename, batch_size=100, workers=workers)
+        rows = list(Voter.objects.order_by("id").values_list(*VOTER_FIELDS))
+        return rows, stats.first_skipped_lines, dict(stats.skip_reasons)
+
+    def test_parallel_parse_matches_serial(self):
+        filename = write_voter_file(self, voter_file_lines(400))
+        rows, skipped, reasons = self.load(filename, workers=1)
+
+        self.assertEqual(len(rows), 397)
+        self.assertEqual(skipped, [39, 152, 401])
+        self.assertEqual(reasons, {"wrong number of fields": 2, "invalid number": 1})
+
+        with mock.patch("voter_analytics.loader.CHUNK_BYTES", 2000):
+            for workers in (2, 3):
+                self.assertEqual(
+                    self.load(filename, workers=workers), (rows, skipped, reasons)
+                )
+
+
+# filter selections checked against the SQL path, as request parameters
+FILTER_SELECTIONS = [
+    {},
+    {"party_affiliation": "D "},
+    {"party_affiliation": "ZZ"},
+    {"min_birth_year": "1950", "max_birth_year": "1969"},
+    {"party_affiliation": "R ", "voter_score": "2", "min_birth_year": "1960"},
+    {"voter_score": "0"},
+    {"v20state": "on", "v22general": "on"},
+    {"party_affiliation": "U ", "max_birth_year": "1940", "v23town": "on"},
+]
+
+
+def sql_counts(voters):
+    """(birth year counts, party counts, election counts) of voters by SQL."""
+    years = (
+        voters.exclude(birth_year__isnull=True)
+        .values_list("birth_year")
+        .annotate(n=Count("id"))
+        .order_by("birth_year")
+    )
+    parties = (
+        voters.values_list("party_affiliation")
+        .annotate(n=Count("id"))
+        .order_by("party_affiliation")
+    )
+    elections = {fld: voters.filter(**{fld: True}).count() for fld in ELECTIONS}
+    return list(years), list(parties), elections
+
+
+class LoadedVotersMixin:
+    """A few hundred voters, some without a date of birth, and the filters."""
+
+    def setUp(self):
+        super().setUp()
+        lines = [voter_line(i) for i in range(600)]
+        for i in range(0, 600, 97):
+            fields = lines[i].split(",")
+            fields[7] = ""
+            lines[i] = ",".join(fields)
+        load_voters(write_voter_file(self, lines), workers=1)
+        # each test's data gets the same version once the last is rolled back
+        bitmaps._index = None
+        self.addCleanup(setattr, bitmaps, "_index", None)
+
+    def view(self, view_class, params):
+        view = view_class()
+        view.request = RequestFactory().get("/", params)
+        return view
+
+
+@unittest.skipIf(np is None, "the bitmap index needs NumPy")
+class BitmapIndexTests(LoadedVotersMixin, TestCase):
+    """The bitmap index answers the filters as the SQL path does."""
+
+    def test_matches_sql(self):
+        index = VoterBitmapIndex.build(get_data_version())
+        self.assertEqual(len(index), 600)
+        for params in FILTER_SELECTIONS:
+            view = self.view(VoterListView, params)
+            voters = view._filtered_queryset()
+            selected = index.select(**view._filters())
+
+            self.assertEqual(index.count(selected), voters.count(), params)
+            self.assertEqual(
+                index.select_ids(selected).tolist(),
+                list(
+                    voters.order_by("last_name", "first_name", "id").values_list(
+                        "id", flat=True
+                    )
+                ),
+                params,
+            )
+            self.assertEqual(
+                (
+                    index.year_counts(selected),
+                    index.party_counts(selected),
+                    index.election_counts(selected),
+                ),
+                sql_counts(voters),
+                params,
+            )
+
+    def test_list_pages_match_sql(self):
+        pages = {}
+        for flag in (True, False):
+            with override_settings(VOTER_BITMAP_INDEX=flag):
+                response = self.client.get("/voter_analytics/", {"page": 3})
+            pages[flag] = (
+                [voter.pk for voter in response.context["voters"]],
+                response.context["paginator"].count,
+            )
+        self.assertEqual(len(pages[True][0]), 100)
+        self.assertEqual(pages[True], pages[False])
+
+
+@override_settings(VOTER_BITMAP_INDEX=False)
+class VoterCubeTests(LoadedVotersMixin, TestCase):
+    """Graph counts summed from the VoterCube match GROUP BYs over Voter."""
+
+    def test_cube_counts_every_voter(self):
+        self.assertLess(VoterCube.objects.count(), Voter.objects.count())
+        self.assertEqual(
+            sum(VoterCube.objects.values_list("voters", flat=True)),
+            Voter.objects.count(),
+        )
+
+    def test_graph_counts_match_voters(self):
+        for params in FILTER_SELECTIONS:
+            view = self.view(GraphsView, params)
+            self.assertEqual(
+                view._graph_counts(), sql_counts(view._filtered_queryset()), params
+            )
+
+    def test_graphs_page(self):
+        response = self.client.get(
+            "/voter_analytics/graphs", {"party_affiliation": "D "}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("graph_birth", response.context)
+
+
+class FilterOptionsTests(LoadedVotersMixin, TestCase):
+    """The filter form's parties and birth years are cached per data version."""
+
+    def setUp(self):
+        super().setUp()
+        # each test's data gets the same version, so clear the last test's
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def options(self):
+        return self.view(VoterListView, {})._filter_options()
+
+    def test_cached_options_need_no_queries(self):
+        options = self.options()
+        self.assertEqual(options["birth_years"], list(range(1969, 1929, -1)))
+        self.assertEqual(
+            options["party_affiliations"],
+            sorted(set(Voter.objects.values_list("party_affiliation", flat=True))),
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.options(), options)
+            context = self.view(VoterListView, {"voter_score": "2"})._filter_context({})
+        self.assertEqual(context["birth_years"], options["birth_years"])
+
+    def test_reload_refreshes_options(self):
+        self.options()
+        lines = []
+        for i in range(20):
+            fields = voter_line(i).split(",")
+            fields[7] = "{}-06-01".format(1990 + i % 2)
+            fields[9] = "G "
+            lines.append(",".join(fields))
+        load_voters(write_voter_file(self, lines), workers=1)
+
+        options = self.options()
+        self.assertEqual(options["birth_years"], [1991, 1990])
+        self.assertEqual(options["party_affiliations"], ["G "])
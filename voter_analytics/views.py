@@ -2,63 +2,116 @@
 # Author: Louise Lee, llouise@bu.edu, 10/30/2025
 # Description: Defines views for voters list, detail, and graphs with reusable filtering + sticky UI state
 
+from django.core.cache import cache
+from django.db.models.query import QuerySet
 from django.views.generic import ListView, DetailView
 from django.utils.http import urlencode
-from django.db.models import Count
-from .models import Voter
+from django.db.models import Q, Sum
+from .bitmaps import get_bitmap_index
+from .models import VERSION_CHECK_INTERVAL, Voter, VoterCube, get_data_version
 
 import plotly
 import plotly.graph_objs as go
 
+# How long the filter form's option lists are cached, in seconds
+FILTER_OPTIONS_CACHE_SECONDS = 24 * 60 * 60
+
+# Election participation fields, with their labels on the graph
+ELECTIONS = {
+    "v20state": "2020 State",
+    "v21town": "2021 Town",
+    "v21primary": "2021 Primary",
+    "v22general": "2022 General",
+    "v23town": "2023 Town",
+}
+
 
 class _FilterMixin:
     """Filtering + context for list and graphs."""
 
-    def _filtered_queryset(self):
-        qs = Voter.objects.all()
-
-        # Party (exact match on stored value)
-        party = self.request.GET.get("party_affiliation", "").upper()
-        if party:
-            qs = qs.filter(party_affiliation=party)
+    def _filters(self):
+        """The filters in the request, None (or empty) where not given."""
+        get = self.request.GET.get
+        return {
+            # Party (exact match on stored value)
+            "party": get("party_affiliation", "").upper() or None,
+            # DOB year range
+            "min_year": int(get("min_birth_year")) if get("min_birth_year") else None,
+            "max_year": int(get("max_birth_year")) if get("max_birth_year") else None,
+            # Voter score
+            "score": int(get("voter_score")) if get("voter_score", "") != "" else None,
+            # Election checkboxes: presence means True
+            "elections": [fld for fld in ELECTIONS if get(fld)],
+        }
 
-        # DOB year range
-        min_year = self.request.GET.get("min_birth_year", "")
-        if min_year:
-            qs = qs.filter(date_of_birth__year__gte=int(min_year))
+    def _apply_filters(self, qs):
+        """
+        Filter qs, of Voters or VoterCube rows (which share the filtered
+        field names), by the request's filters.
+        """
+        filters = self._filters()
+
+        if filters["party"] is not None:
+            qs = qs.filter(party_affiliation=filters["party"])
+        if filters["min_year"] is not None:
+            qs = qs.filter(birth_year__gte=filters["min_year"])
+        if filters["max_year"] is not None:
+            qs = qs.filter(birth_year__lte=filters["max_year"])
+        if filters["score"] is not None:
+            qs = qs.filter(voter_score=filters["score"])
+        for fld in filters["elections"]:
+            qs = qs.filter(**{fld: True})
 
-        max_year = self.request.GET.get("max_birth_year", "")
-        if max_year:
-            qs = qs.filter(date_of_birth__year__lte=int(max_year))
+        return qs
 
-        # Voter score
-        score = self.request.GET.get("voter_score", "")
-        if score != "":
-            qs = qs.filter(voter_score=int(score))
+    def _filtered_queryset(self):
+        return self._apply_filters(Voter.objects.all())
+
+    def _filtered_cube(self):
+        """The VoterCube rows matching the same filters as _filtered_queryset."""
+        return self._apply_filters(VoterCube.objects.all())
+
+    def _bitmap_selection(self):
+        """
+        (index, selected voters) from the in-memory bitmap index, or
+        (None, None) when the index is not available.
+        """
+        index = get_bitmap_index()
+        if index is None:
+            return None, None
+        return index, index.select(**self._filters())
+
+    def _filter_options(self):
+        """
+        Distinct parties and birth years for the filter form, cached under
+        the data version so they are only recomputed after a reload.
+        """
+        key = "voter_analytics:filter_options:{}".format(
+            get_data_version(VERSION_CHECK_INTERVAL)
+        )
+        options = cache.get(key)
+        if options is None:
+            # Distinct parties (already stored as upcased)
+            parties = (
+                Voter.objects.values_list("party_affiliation", flat=True)
+                .distinct()
+                .order_by("party_affiliation")
+            )
 
-        # Election checkboxes: presence means True
-        for fld in ["v20state", "v21town", "v21primary", "v22general", "v23town"]:
-            if self.request.GET.get(fld):
-                qs = qs.filter(**{fld: True})
+            # Distinct DOB years, newest first
+            years = (
+                Voter.objects.exclude(birth_year__isnull=True)
+                .values_list("birth_year", flat=True)
+                .distinct()
+                .order_by("-birth_year")
+            )
 
-        return qs
+            options = {"party_affiliations": list(parties), "birth_years": list(years)}
+            cache.set(key, options, FILTER_OPTIONS_CACHE_SECONDS)
+        return options
 
     def _filter_context(self, context):
-        # Distinct parties (already stored as upcased)
-        context["party_affiliations"] = (
-            Voter.objects.values_list("party_affiliation", flat=True)
-            .distinct()
-            .order_by("party_affiliation")
-        )
-
-        # Distinct DOB years, newest first
-        years = (
-            Voter.objects.exclude(date_of_birth__isnull=True)
-            .values_list("date_of_birth__year", flat=True)
-            .distinct()
-            .order_by("-date_of_birth__year")
-        )
-        context["birth_years"] = years
+        context.update(self._filter_options())
 
         # Scores for dropdown
         context["scores"] = [0, 1, 2, 3, 4, 5]
@@ -80,7 +133,23 @@ class VoterListView(_FilterMixin, ListView):
     paginate_by = 100
 
     def get_queryset(self):
-        return self._filtered_queryset().order_by("last_name", "first_name")
+        # With the bitmap index, the ids of the voters in list order; only
+        # the page shown is read from the database
+        index, selected = self._bitmap_selection()
+        if index is not None:
+            return index.select_ids(selected)
+        return self._filtered_queryset().order_by("last_name", "first_name", "id")
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator, page, voters, is_paginated = super().paginate_queryset(
+            queryset, page_size
+        )
+        if not isinstance(queryset, QuerySet):
+            # a page of ids from the bitmap index
+            ids = voters.tolist()
+            by_id = Voter.objects.in_bulk(ids)
+            voters = page.object_list = [by_id[pk] for pk in ids if pk in by_id]
+        return paginator, page, voters, is_paginated
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -109,19 +178,11 @@ class GraphsView(_FilterMixin, ListView):
         context = super().get_context_data(**kwargs)
         self._filter_context(context)
 
-        voters = context["voters"]
+        year_counts, party_counts, election_counts = self._graph_counts()
 
         # 1) Birth year histogram
-        byears = list(
-            voters.exclude(date_of_birth__isnull=True).values_list(
-                "date_of_birth__year", flat=True
-            )
-        )
-        year_counts = {}
-        for y in byears:
-            year_counts[y] = year_counts.get(y, 0) + 1
-        x_years = sorted(year_counts.keys())
-        y_counts = [year_counts[y] for y in x_years]
+        x_years = [y for y, n in year_counts]
+        y_counts = [n for y, n in year_counts]
         fig_birth = go.Bar(x=x_years, y=y_counts)
         context["graph_birth"] = plotly.offline.plot(
             {
@@ -137,13 +198,8 @@ class GraphsView(_FilterMixin, ListView):
         )
 
         # 2) Party pie
-        pcounts = (
-            voters.values("party_affiliation")
-            .annotate(n=Count("party_affiliation"))
-            .order_by("party_affiliation")
-        )
-        labels = [(r["party_affiliation"] or "").strip() or "(blank)" for r in pcounts]
-        values = [r["n"] for r in pcounts]
+        labels = [(p or "").strip() or "(blank)" for p, n in party_counts]
+        values = [n for p, n in party_counts]
         fig_party = go.Pie(labels=labels, values=values, hole=0.3)
         context["graph_party"] = plotly.offline.plot(
             {
@@ -155,13 +211,7 @@ class GraphsView(_FilterMixin, ListView):
         )
 
         # 3) Election participation bars
-        elections = {
-            "2020 State": voters.filter(v20state=True).count(),
-            "2021 Town": voters.filter(v21town=True).count(),
-            "2021 Primary": voters.filter(v21primary=True).count(),
-            "2022 General": voters.filter(v22general=True).count(),
-            "2023 Town": voters.filter(v23town=True).count(),
-        }
+        elections = {label: election_counts[fld] for fld, label in ELECTIONS.items()}
         fig_elec = go.Bar(x=list(elections.keys()), y=list(elections.values()))
         context["graph_elections"] = plotly.offline.plot(
             {
@@ -177,3 +227,42 @@ class GraphsView(_FilterMixin, ListView):
         )
 
         return context
+
+    def _graph_counts(self):
+        """
+        (birth year counts, party counts, election counts) of the filtered
+        voters: from the bitmap index when available, otherwise by summing
+        the matching VoterCube rows in two queries, per birth year and per
+        party (with each party's voters in every election).
+        """
+        index, selected = self._bitmap_selection()
+        if index is not None:
+            return (
+                index.year_counts(selected),
+                index.party_counts(selected),
+                index.election_counts(selected),
+            )
+
+        cube = self._filtered_cube()
+        year_counts = (
+            cube.exclude(birth_year__isnull=True)
+            .values_list("birth_year")
+            .annotate(n=Sum("voters"))
+            .order_by("birth_year")
+        )
+        pcounts = list(
+            cube.values("party_affiliation")
+            .annotate(
+                n=Sum("voters"),
+                **{
+                    fld + "_n": Sum("voters", filter=Q(**{fld: True}))
+                    for fld in ELECTIONS
+                },
+            )
+            .order_by("party_affiliation")
+        )
+        return (
+            list(year_counts),
+            [(r["party_affiliation"], r["n"]) for r in pcounts],
+            {fld: sum(r[fld + "_n"] or 0 for r in pcounts) for fld in ELECTIONS},
+        )